@@ -0,0 +1,617 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import REPLICATES, lift_intervals
+from data_cache import content_hash
+from data_loader import SCHEMA, SEGMENT_ATTRIBUTES, iter_campaign_chunks
+from metric_definitions import CAMPAIGN_METRICS, SEGMENT_METRICS, evaluate, evaluate_totals
+from permutation import PERMUTATIONS, permutation_tests
+from quantile_sketch import QuantileSketch
+from sequential import sequential_tests
+from significance import pairwise_tests, summary_from_sums
+
+# Every table the dashboard shows is a roll-up of cells keyed by these columns,
+# so a single pass over the rows is enough to serve all of them.
+GROUP_KEYS = ["campaign_segment"] + SEGMENT_ATTRIBUTES
+VALUE_COLUMNS = ["visit", "conversion", "spend"]
+
+# history_spend terciles used by the Spend Profile tab. The in-memory cube adds
+# them as one more key, so every tab (segment x attribute x tier) is a roll-up.
+SPEND_TIERS = ["Low Value", "Medium Value", "High Value"]
+CUBE_KEYS = GROUP_KEYS + ["spend_group"]
+
+# Streamed aggregates cannot cut terciles up front, so they keep separate tier
+# cells per campaign_segment x history_spend bucket of a QuantileSketch.
+# Rolling n up to the bucket gives the sketch itself, which merges and appends
+# like every other cell, and the tiers are cut from it when the Spend Profile
+# is read. Keeping the buckets out of the attribute cells' key stops them
+# multiplying the cell count (and the stored JSON) by the number of buckets.
+SPEND_SKETCH = QuantileSketch()
+TIER_KEYS = ["campaign_segment", "spend_bucket"]
+
+# Sufficient statistics kept per cell. visit and conversion are 0/1 flags, so
+# their sums of squares equal their sums and are not stored separately.
+# spend_n counts non-missing spend values (the t-tests omit NaN spend).
+STAT_COLUMNS = ["n", "visit", "conversion", "spend_n", "spend", "spend_sq"]
+
+# Keys the dashboard's sidebar filters can restrict; campaign_segment stays the comparison axis.
+FILTER_COLUMNS = [key for key in GROUP_KEYS if key != "campaign_segment"]
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+# Worker processes for parallel_aggregates (1 aggregates in-process). Frames
+# with fewer than _MIN_SHARD_ROWS rows per worker are not worth a pool.
+AGGREGATE_WORKERS = int(os.environ.get("CAMPAIGN_AGGREGATE_WORKERS", 1))
+_MIN_SHARD_ROWS = 250_000
+
+# Persisted aggregates, one JSON file per dataset id.
+STORE_DIR = os.environ.get("CAMPAIGN_AGGREGATE_DIR", os.path.join(".cache", "aggregates"))
+
+
+def _take(values, rows):
+    # The selected rows of an array, taken before any conversion so a selection costs its own size.
+    return values if rows is None else values[rows]
+
+
+def encode_keys(frame, keys, rows=None):
+    """Pack several low-cardinality key columns into one integer code per row.
+
+    Returns (codes, levels) where levels[i] holds the values of keys[i] and
+    codes is the mixed-radix index into the product of all level sets.
+    Categoricals reuse their codes, small non-negative integers (the 0/1
+    flags) are used as-is, anything else is factorised. Missing values get a
+    level of their own so their rows still count. `rows` (row positions)
+    encodes only those rows.
+    """
+    codes = np.zeros(len(frame) if rows is None else len(rows), dtype=np.int64)
+    levels = []
+    for key in keys:
+        column = frame[key]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            key_codes = _take(column.cat.codes.to_numpy(), rows).astype(np.int64)
+            key_levels = np.asarray(column.cat.categories, dtype=object)
+            if (key_codes < 0).any():
+                key_codes[key_codes < 0] = len(key_levels)
+                key_levels = np.append(key_levels, np.nan)
+        else:
+            # Nullable flags holding <NA> come out of to_numpy() as floats and are factorised.
+            values = _take(column.to_numpy(), rows)
+            if values.dtype.kind in "ub" and len(values) and values.max() < 256:
+                key_codes = values.astype(np.int64)
+                key_levels = np.arange(int(key_codes.max()) + 1).astype(values.dtype)
+            else:
+                # Nullable integer levels stay an extension array, so the flags keep integer labels beside <NA>.
+                if isinstance(column.dtype, pd.api.extensions.ExtensionDtype):
+                    values = _take(column.array, rows)
+                key_codes, key_levels = pd.factorize(values, sort=True, use_na_sentinel=False)
+                if not isinstance(key_levels, pd.api.extensions.ExtensionArray):
+                    key_levels = np.asarray(key_levels)
+        codes = codes * len(key_levels) + key_codes
+        levels.append(key_levels)
+    return codes, levels
+
+
+def cell_statistics(frame, keys, rows=None):
+    """STAT_COLUMNS per non-empty key cell, computed with np.bincount.
+
+    The keys here have a handful of values each, so one packed integer code
+    and a bincount per statistic over contiguous arrays replaces pandas'
+    generic hash-based groupby. Only occupied cells are returned. `rows`
+    (row positions, e.g. from a BitmapIndex) restricts the statistics to a
+    subset without materialising a filtered frame; only the selected rows
+    are encoded and converted, so the cost follows the selection size.
+    """
+    def column(name):
+        # Missing visit/conversion flags add nothing to their sums, as SUM() skips NULL in SQL.
+        return np.nan_to_num(_take(frame[name].to_numpy(), rows).astype(np.float64))
+
+    codes, levels = encode_keys(frame, keys, rows)
+    shape = tuple(max(len(level), 1) for level in levels)
+    size = int(np.prod(shape))
+    spend = _take(frame["spend"].to_numpy(), rows).astype(np.float64)
+    spend_valid = ~np.isnan(spend)
+    spend = np.where(spend_valid, spend, 0.0)
+
+    n = np.bincount(codes, minlength=size)
+    occupied = np.flatnonzero(n)
+    stats = {
+        "n": n[occupied].astype(np.float64),
+        "visit": np.bincount(codes, weights=column("visit"), minlength=size)[occupied],
+        "conversion": np.bincount(codes, weights=column("conversion"), minlength=size)[occupied],
+        "spend_n": np.bincount(codes, weights=spend_valid.astype(np.float64), minlength=size)[occupied],
+        "spend": np.bincount(codes, weights=spend, minlength=size)[occupied],
+        "spend_sq": np.bincount(codes, weights=spend * spend, minlength=size)[occupied],
+    }
+    key_codes = np.unravel_index(occupied, shape)
+    index = pd.MultiIndex.from_arrays(
+        [level[code] for level, code in zip(levels, key_codes)], names=list(keys)
+    )
+    return pd.DataFrame(stats, index=index)
+
+
+def _with_derived_keys(frame, keys):
+    if "spend_bucket" in keys and "spend_bucket" not in frame.columns:
+        frame = frame.assign(spend_bucket=SPEND_SKETCH.bucket(frame["history_spend"]))
+    return frame
+
+
+def _source_columns(keys):
+    """Raw columns needed to aggregate by `keys`."""
+    return [("history_spend" if key == "spend_bucket" else key) for key in keys] + VALUE_COLUMNS
+
+
+def _add_cells(frames, keys):
+    # Sum cell statistics with matching keys; frames[0] is returned as-is if nothing else has rows.
+    occupied = [frame for frame in frames if not frame.empty]
+    if len(occupied) <= 1:
+        return occupied[0] if occupied else frames[0]
+    return pd.concat(occupied).groupby(level=list(keys), sort=False, dropna=False).sum()
+
+
+class CampaignAggregates:
+    """Counts, sums and sums of squares per campaign_segment x attribute cell.
+
+    `tiers`, when given, are CampaignAggregates keyed by TIER_KEYS that are
+    updated, merged and stored alongside the cells (streamed spend tiers).
+    """
+
+    def __init__(self, keys=GROUP_KEYS, cells=None, tiers=None):
+        self.keys = list(keys)
+        if cells is None:
+            index = pd.MultiIndex.from_arrays([[] for _ in self.keys], names=self.keys)
+            cells = pd.DataFrame(0, index=index, columns=STAT_COLUMNS, dtype="float64")
+        self.cells = cells
+        self.tiers = tiers
+        self._rollups = {}
+
+    @classmethod
+    def from_frame(cls, df, keys=GROUP_KEYS, rows=None):
+        aggregates = cls(keys)
+        aggregates.update(df, rows)
+        return aggregates
+
+    @classmethod
+    def with_spend_sketch(cls, keys=GROUP_KEYS):
+        """Empty aggregates that also keep sketched spend-tier cells, for streaming."""
+        return cls(keys, tiers=CampaignAggregates(TIER_KEYS))
+
+    def source_columns(self):
+        """Raw columns update() reads."""
+        keys = self.keys + (self.tiers.keys if self.tiers is not None else [])
+        return list(dict.fromkeys(_source_columns(keys)))
+
+    def update(self, chunk, rows=None):
+        """Fold a frame of raw rows into the running cell statistics."""
+        # Cells are keyed by plain values (not per-chunk categorical codes), so
+        # chunks with different category sets line up when added together.
+        # Rows with a missing key keep a cell of their own, as df.shape[0] would count them.
+        if self.tiers is not None:
+            self.tiers.update(chunk, rows)
+        chunk = _with_derived_keys(chunk, self.keys)
+        self.cells = _add_cells([self.cells, cell_statistics(chunk, self.keys, rows)], self.keys)
+        self._rollups = {}
+
+    def merge(self, *others):
+        """New aggregates holding the rows of self and every other; the inputs are left untouched.
+
+        Cell statistics are plain sums, so aggregating shards separately and
+        merging them gives the same counts as aggregating the concatenated rows
+        (float sums agree up to summation order).
+        """
+        for other in others:
+            if list(other.keys) != list(self.keys):
+                raise ValueError(f"Cannot merge aggregates keyed by {other.keys} into {self.keys}")
+        cells = _add_cells([self.cells] + [other.cells for other in others], self.keys)
+        # Tier cells survive only if every input has them.
+        tiers = None
+        if all(part.tiers is not None for part in (self,) + others):
+            tiers = self.tiers.merge(*(other.tiers for other in others))
+        return type(self)(self.keys, cells, tiers)
+
+    def __add__(self, other):
+        if not isinstance(other, CampaignAggregates):
+            return NotImplemented
+        return self.merge(other)
+
+    def to_dict(self):
+        table = self.cells.reset_index()
+        # Missing key levels are written as null
+        keys = table[self.keys].astype(object)
+        table[self.keys] = keys.where(keys.notna(), None)
+        table = table.to_dict(orient="split", index=False)
+        payload = {"keys": self.keys, "columns": table["columns"], "data": table["data"]}
+        if self.tiers is not None:
+            payload["tiers"] = self.tiers.to_dict()
+        return payload
+
+    @classmethod
+    def from_dict(cls, payload):
+        tiers = CampaignAggregates.from_dict(payload["tiers"]) if payload.get("tiers") else None
+        if not payload["data"]:
+            return cls(payload["keys"], tiers=tiers)
+        cells = pd.DataFrame(payload["data"], columns=payload["columns"])
+        # Integer keys with a missing level come back as floats; restore their schema dtype
+        cells = cells.astype({key: SCHEMA[key] for key in payload["keys"] if SCHEMA.get(key, "category") != "category"})
+        cells = cells.set_index(payload["keys"])
+        return cls(payload["keys"], cells[STAT_COLUMNS].astype("float64"), tiers)
+
+    def to_bytes(self):
+        """Serialise for another process or machine; floats round-trip exactly through JSON."""
+        return json.dumps(self.to_dict()).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    @property
+    def n_rows(self):
+        return int(self.cells["n"].sum())
+
+    def key_values(self, key):
+        """Sorted non-missing values of one key."""
+        values = self.cells.index.get_level_values(key)
+        return sorted(values[values.notna()].unique().tolist())
+
+    def filter(self, filters):
+        """Aggregates of the cells matching {key: [values]} (OR within a key, AND across keys)."""
+        selected = np.ones(len(self.cells), dtype=bool)
+        for key, values in filters.items():
+            selected &= self.cells.index.get_level_values(key).isin(values)
+        # Tier cells are only split by campaign_segment, so other filters drop them.
+        tiers = None
+        if self.tiers is not None and set(filters) <= set(self.tiers.keys):
+            tiers = self.tiers.filter(filters)
+        return type(self)(self.keys, self.cells[selected], tiers)
+
+    def rollup(self, by):
+        """Sum the cells down to the given key columns (memoised until the next update)."""
+        by = tuple(by)
+        if by not in self._rollups:
+            self._rollups[by] = self.cells.groupby(level=list(by), sort=True).sum()
+        return self._rollups[by]
+
+    def evaluate(self, by, names=CAMPAIGN_METRICS):
+        """Declared metrics (see metric_definitions) per group of the `by` keys, keys as columns."""
+        return evaluate(self.rollup(by), names).reset_index()
+
+    def totals(self):
+        return evaluate_totals(self.cells)
+
+    def metrics(self):
+        """Same layout as the per-campaign `metrics` table in app.py."""
+        return self.evaluate(["campaign_segment"])
+
+    def segment_metrics(self, *segment_cols):
+        """Visit rate, conversion rate and average spend per campaign_segment x one or more attributes.
+
+        Only occupied cells are stored, so crossing two attributes is a roll-up
+        of the same sparse cells and never touches the rows.
+        """
+        return self.evaluate(["campaign_segment", *segment_cols], SEGMENT_METRICS)
+
+    def spend_sketch(self):
+        """QuantileSketch of history_spend; needs aggregates with tier cells."""
+        counts = self._tier_cells().rollup(["spend_bucket"])["n"]
+        return QuantileSketch(SPEND_SKETCH.relative_accuracy, dict(zip(counts.index, counts.to_numpy())))
+
+    def spend_tier_edges(self):
+        """Approximate history_spend tercile cut points (see quantile_sketch for the error bounds)."""
+        return self.spend_sketch().quantiles([1 / 3, 2 / 3]).tolist()
+
+    def _tier_cells(self):
+        if self.tiers is None:
+            raise ValueError("These aggregates were built without spend tiers")
+        return self.tiers
+
+    def _sketched_tiers(self):
+        # Whole buckets go to one tier: the buckets holding the cut points close the lower tiers.
+        cells = self._tier_cells().rollup(TIER_KEYS)
+        edges = self.spend_sketch().quantile_buckets([1 / 3, 2 / 3])
+        tiers = np.asarray(SPEND_TIERS)[np.searchsorted(edges, cells.index.get_level_values("spend_bucket"))]
+        segments = cells.index.get_level_values("campaign_segment")
+        return cells.groupby([segments, pd.Index(tiers, name="spend_group")]).sum()
+
+    def spend_profile(self):
+        """Conversion rate per campaign_segment x spend tier.
+
+        Exact terciles for a cube built with spend_group, sketched ones for
+        aggregates with tier cells.
+        """
+        if "spend_group" in self.keys:
+            cells = self.rollup(["campaign_segment", "spend_group"])
+        else:
+            cells = self._sketched_tiers()
+        out = evaluate(cells, ["conversion_rate"]).reset_index()
+        out["spend_group"] = pd.Categorical(out["spend_group"], categories=SPEND_TIERS, ordered=True)
+        return out.sort_values(["campaign_segment", "spend_group"]).reset_index(drop=True)
+
+    def contingency(self, segment_a, segment_b, metric="visit"):
+        """2x2 table of [hits, misses] for two campaign segments."""
+        cells = self.rollup(["campaign_segment"])
+        table = []
+        for segment in (segment_a, segment_b):
+            hits = cells.at[segment, metric]
+            table.append([hits, cells.at[segment, "n"] - hits])
+        return table
+
+    def spend_summary(self, segment):
+        """(mean, sample standard deviation, count) of non-missing spend in a segment."""
+        row = self.rollup(["campaign_segment"]).loc[segment]
+        mean, std, n = summary_from_sums(row["spend_n"], row["spend"], row["spend_sq"])
+        return float(mean), float(std), float(n)
+
+    def comparison_cells(self, attributes=()):
+        """Cell statistics per campaign_segment, overall and within each level of `attributes`, stacked.
+
+        Keyed by (attribute, level), with "All" for the whole selection, so
+        every comparison can be made in one batch.
+        """
+        frames = [self.rollup(["campaign_segment"]).reset_index().assign(attribute="All", level="All")]
+        for attribute in attributes:
+            cells = self.rollup([attribute, "campaign_segment"]).reset_index()
+            frames.append(cells.rename(columns={attribute: "level"}).assign(attribute=attribute))
+        return pd.concat(frames, ignore_index=True)
+
+    def pairwise_tests(self, attributes=(), equal_var=True, correction="holm", spend_histograms=None,
+                       permutations=PERMUTATIONS, workers=None):
+        """Tests of every campaign_segment pair, overall and within each level of `attributes`.
+
+        Every comparison (see comparison_cells) is tested and corrected in one
+        batch (see significance.pairwise_tests). With `spend_histograms` (see
+        permutation.attribute_histograms), spend is compared by a permutation
+        test instead of a t-test.
+        """
+        tests = pairwise_tests(self.comparison_cells(attributes), ["attribute", "level"], equal_var, correction)
+        if spend_histograms is None:
+            return tests
+        return permutation_tests(tests, spend_histograms, ["attribute", "level"], permutations, correction,
+                                 workers=workers)
+
+    def sequential_tests(self, attributes=(), state=None):
+        """Always-valid p-values of every campaign_segment pair after one more look (see sequential.sequential_tests)."""
+        return sequential_tests(self.comparison_cells(attributes), ["attribute", "level"], state)
+
+    def lift_intervals(self, histograms=None, replicates=REPLICATES, workers=None, seed=0):
+        """Bootstrap intervals for the conversion and spend lift of every campaign_segment pair.
+
+        Conversions are resampled from the counts; spend from `histograms`
+        (see bootstrap.spend_histograms) when given, since the cells keep only
+        its sums.
+        """
+        return lift_intervals(self.rollup(["campaign_segment"]), histograms, replicates, workers=workers, seed=seed)
+
+    def describe(self):
+        """count / mean / std of the aggregated value columns, like DataFrame.describe()."""
+        totals = self.cells.sum()
+        n = totals["n"]
+        rows = {}
+        for col in ("visit", "conversion"):
+            mean = totals[col] / n
+            rows[col] = [n, mean, np.sqrt(mean * (1 - mean) * n / (n - 1))]
+        spend_mean = totals["spend"] / totals["spend_n"]
+        spend_var = (totals["spend_sq"] - totals["spend_n"] * spend_mean ** 2) / (totals["spend_n"] - 1)
+        rows["spend"] = [totals["spend_n"], spend_mean, np.sqrt(max(spend_var, 0.0))]
+        return pd.DataFrame(rows, index=["count", "mean", "std"])
+
+
+def merge_aggregates(parts, keys=GROUP_KEYS):
+    """Merge aggregates built independently (per shard, file or day) into one."""
+    parts = list(parts)
+    if not parts:
+        return CampaignAggregates(keys)
+    return parts[0].merge(*parts[1:])
+
+
+def _share_columns(df, columns, rows=None):
+    """Copy columns (only `rows`, if given) into one shared memory block; returns the block and a picklable layout."""
+    arrays, layout, offset = [], [], 0
+    for col in columns:
+        column = df[col]
+        categories = None
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = list(column.cat.categories)
+            column = column.cat.codes
+        array = column.to_numpy()
+        array = np.ascontiguousarray(array if rows is None else array[rows])
+        arrays.append(array)
+        layout.append((col, array.dtype.str, offset, categories))
+        offset += -(-array.nbytes // 8) * 8
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for array, (_, _, start, _) in zip(arrays, layout):
+        np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=start)[:] = array
+    return block, layout
+
+
+def _shard_statistics(block, layout, n_rows, start, stop, keys):
+    columns = {}
+    for col, dtype, offset, categories in layout:
+        values = np.ndarray(n_rows, dtype, buffer=block.buf, offset=offset)[start:stop]
+        if categories is not None:
+            values = pd.Categorical.from_codes(values, categories)
+        columns[col] = values
+    shard = pd.DataFrame(columns, copy=False)
+    return CampaignAggregates(keys, cell_statistics(shard, keys)).to_bytes()
+
+
+def _aggregate_shard(block_name, layout, n_rows, start, stop, keys):
+    # Runs in a worker: attach to the parent's block and read the row range in place.
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        return _shard_statistics(block, layout, n_rows, start, stop, keys)
+    finally:
+        block.close()
+
+
+def parallel_aggregates(df, keys=GROUP_KEYS, workers=None, rows=None):
+    """CampaignAggregates of an in-memory frame, built from row shards on a process pool.
+
+    The key and value columns are copied once into shared memory; each worker
+    maps its row range from there, so no rows are pickled, and only the small
+    per-shard cell tables come back to be merged. `rows` restricts the
+    aggregates to those row positions.
+    """
+    n_rows = len(df) if rows is None else len(rows)
+    workers = min(workers or AGGREGATE_WORKERS, max(n_rows // _MIN_SHARD_ROWS, 1))
+    if workers <= 1:
+        return CampaignAggregates.from_frame(df, keys, rows)
+    bounds = np.linspace(0, n_rows, workers + 1).astype(int)
+    block, layout = _share_columns(_with_derived_keys(df, keys), list(keys) + VALUE_COLUMNS, rows)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_aggregate_shard, block.name, layout, n_rows, start, stop, list(keys))
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            parts = [CampaignAggregates.from_bytes(future.result()) for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+    return merge_aggregates(parts, keys)
+
+
+def spend_tiers(history_spend):
+    """SPEND_TIERS terciles of history_spend, like pd.qcut(q=3).
+
+    Ties can make tercile edges coincide (a small filtered selection of equal
+    values, say); the duplicate edges are merged and the remaining bins take
+    the lowest tier labels, down to a single "Low Value" tier.
+    """
+    if history_spend.nunique() < 2:
+        # A single distinct value leaves no bin for qcut to cut.
+        codes = np.where(history_spend.notna(), 0, -1)
+    else:
+        codes = pd.qcut(history_spend, q=3, labels=False, duplicates="drop")
+        codes = np.asarray(codes.fillna(-1), dtype=np.int64)
+    tiers = pd.Categorical.from_codes(codes, SPEND_TIERS, ordered=True)
+    return pd.Series(tiers, index=history_spend.index, name=history_spend.name)
+
+
+def build_cube(df, workers=None, rows=None):
+    """Aggregate an in-memory frame once into the cube every dashboard tab is served from.
+
+    With `rows`, the cube covers only those row positions and the spend tiers
+    are the terciles of the selected rows, as if the subset had been uploaded
+    on its own.
+    """
+    # Only the columns the cube reads, and only the selected rows of them, are gathered,
+    # so a filtered cube costs time in proportion to the selection.
+    columns = {col: df[col] if rows is None else df[col].take(rows) for col in GROUP_KEYS + VALUE_COLUMNS}
+    history_spend = df["history_spend"] if rows is None else df["history_spend"].take(rows)
+    if history_spend.empty:
+        return CampaignAggregates(CUBE_KEYS)
+    # Tiers need the whole column, so they are cut here before the rows are sharded.
+    frame = pd.DataFrame({**columns, "spend_group": spend_tiers(history_spend)}, copy=False)
+    return parallel_aggregates(frame, CUBE_KEYS, workers)
+
+
+def grouped_metrics(df, groupings, names=CAMPAIGN_METRICS):
+    """Declared metrics for several groupings of a frame, from a single pass over its rows.
+
+    The rows are aggregated once, keyed by every column any grouping uses;
+    each grouping is then a roll-up of those cells. Returns one frame per
+    grouping, in order, with the grouping columns first.
+    """
+    keys = list(dict.fromkeys(key for grouping in groupings for key in grouping))
+    cube = CampaignAggregates.from_frame(df, keys)
+    return [cube.evaluate(grouping, names) for grouping in groupings]
+
+
+def stream_aggregates(source, chunksize=DEFAULT_CHUNKSIZE, keys=GROUP_KEYS, filters=None):
+    """Build CampaignAggregates from a CSV or partitioned directory in bounded memory, one chunk at a time."""
+    aggregates = CampaignAggregates.with_spend_sketch(keys)
+    for chunk in iter_campaign_chunks(source, aggregates.source_columns(), chunksize, filters):
+        aggregates.update(chunk)
+    return aggregates
+
+
+class AggregateStore:
+    """CampaignAggregates persisted per dataset so new rows can be appended without a rescan.
+
+    Daily delta files are folded into the stored cell statistics in time
+    proportional to the delta. Each delta's content hash is recorded, so
+    appending the same file twice is a no-op. Every write is also one look of
+    the sequential tests (see sequential.py), whose running state is stored
+    alongside the aggregates.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.json")
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def version(self, name):
+        """Changes whenever the stored aggregates change; 0 if nothing is stored."""
+        try:
+            return os.stat(self._path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _read(self, name):
+        with open(self._path(name)) as fh:
+            return json.load(fh)
+
+    def _write(self, name, payload):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._path(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp_path, self._path(name))
+
+    def load(self, name):
+        if not self.exists(name):
+            return None
+        return CampaignAggregates.from_dict(self._read(name)["aggregates"])
+
+    def load_sequential(self, name):
+        """The latest sequential_tests() state of a dataset, or None if it has none yet."""
+        if not self.exists(name):
+            return None
+        return _sequential_state(self._read(name))
+
+    def save(self, name, aggregates, applied=(), sequential=None, reset=False):
+        """Store aggregates, taking one more look of the sequential tests unless `sequential` is given.
+
+        The look continues from the stored state, so re-saving a dataset never
+        restarts its running p-values; `reset=True` starts them afresh.
+        """
+        if sequential is None:
+            previous = None if reset else self.load_sequential(name)
+            sequential = aggregates.sequential_tests(_monitored_attributes(aggregates), previous)
+        self._write(name, {
+            "aggregates": aggregates.to_dict(),
+            "applied": list(applied),
+            "sequential": sequential.to_dict(orient="split", index=False),
+        })
+
+    def append(self, name, delta_source, chunksize=DEFAULT_CHUNKSIZE):
+        """Fold a delta CSV into the stored aggregates and return the updated aggregates."""
+        payload = self._read(name) if self.exists(name) else {"aggregates": CampaignAggregates().to_dict(), "applied": []}
+        aggregates = CampaignAggregates.from_dict(payload["aggregates"])
+        digest = content_hash(delta_source)
+        if digest in payload["applied"]:
+            return aggregates
+        for chunk in iter_campaign_chunks(delta_source, aggregates.source_columns(), chunksize):
+            aggregates.update(chunk)
+        sequential = aggregates.sequential_tests(_monitored_attributes(aggregates), _sequential_state(payload))
+        self.save(name, aggregates, payload["applied"] + [digest], sequential)
+        return aggregates
+
+
+def _sequential_state(payload):
+    # The sequential_tests() state stored in a payload, or None
+    state = payload.get("sequential")
+    return pd.DataFrame(state["data"], columns=state["columns"]) if state else None
+
+
+def _monitored_attributes(aggregates):
+    # Segment attributes the stored cells can break comparisons down by
+    return [attribute for attribute in SEGMENT_ATTRIBUTES if attribute in aggregates.keys]
@@ -1,9 +1,23 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.stats import chi2_contingency, ttest_ind
+from aggregates import (
+    AGGREGATE_WORKERS, FILTER_COLUMNS, SPEND_SKETCH, AggregateStore, build_cube, stream_aggregates
+)
+from approximate import CONFIDENCE, sample_cube
+from bitmap_index import BitmapIndex
+from bootstrap import CONFIDENCE as LIFT_CONFIDENCE, REPLICATES, spend_histograms
+from permutation import PERMUTATION_BINS, PERMUTATIONS, attribute_histograms
+from sequential import sequential_signals
+from significance import adjust_tests
+from sql_backend import SQL_DIR, SqlBackend, default_engine
+from data_cache import cached_read
+from data_loader import FLAG_COLUMNS, SEGMENT_ATTRIBUTES, columns_for, compression_for, iter_campaign_chunks
+from dataset_registry import DatasetUnavailable, is_available, register_path, register_upload, resolve
 
 # Set page config
 st.set_page_config(page_title="Marketing Campaign Performance", layout="wide")
@@ -138,15 +152,126 @@ st.markdown("### Analyzing the impact of email marketing strategies on conversio
 st.markdown("---")
 
 # 1. Data Loading (Cached)
+# The frame behind the cube and the row-level spend tests: the columns of the tabs it serves.
+# Data Overview summarises this frame and streams its full-width sample separately, so no other column is parsed.
+ANALYSIS_COLUMNS = columns_for(
+    "Executive Summary", "Campaign Performance", "Statistical Tests", "Segmentation Deep Dive", "Spend Profile"
+)
+
+# Loaders are keyed by a dataset id from dataset_registry, so reruns only hash a short string
 @st.cache_data
-def load_data(file):
-    df = pd.read_csv(file)
+def load_data(dataset_id, columns=None):
+    df = cached_read(resolve(dataset_id), columns=columns, key=dataset_id)
     return df
 
+@st.cache_resource
+def load_index(dataset_id):
+    # Packed row bitmaps per filter value, built once per dataset
+    return BitmapIndex.from_frame(load_data(dataset_id, columns=ANALYSIS_COLUMNS), FILTER_COLUMNS)
+
+@st.cache_resource
+def load_selection(dataset_id, filter_key):
+    # One bit per row for each filter combination seen this session
+    return load_index(dataset_id).select(dict(filter_key))
+
+@st.cache_data
+def load_cube(dataset_id, columns=None, workers=1, filter_key=()):
+    # Count / sum / sum of squares per segment x attribute x spend tier, built once per dataset and filter combination
+    rows = load_index(dataset_id).rows(load_selection(dataset_id, filter_key)) if filter_key else None
+    return build_cube(load_data(dataset_id, columns), workers=workers, rows=rows)
+
+@st.cache_data
+def load_sample_cube(dataset_id):
+    # Approximate mode: stratified sample from random blocks of the file, ready in a fraction of a second
+    return sample_cube(resolve(dataset_id))
+
+@st.cache_resource
+def start_exact_cube(dataset_id, columns, workers):
+    # Approximate mode: the exact cube (and the columnar cache entry) is built on a
+    # background thread while the sample answers; reruns pick it up once it is done
+    def build():
+        return build_cube(cached_read(resolve(dataset_id), columns=columns, key=dataset_id), workers=workers)
+    executor = ThreadPoolExecutor(max_workers=1)
+    job = executor.submit(build)
+    executor.shutdown(wait=False)
+    return job
+
+@st.cache_data
+def load_aggregates(dataset_id, version):
+    # Streaming mode: only per-segment sufficient statistics are kept, never the full frame.
+    # They are persisted in the aggregate store; `version` changes whenever a delta is appended.
+    store = AggregateStore()
+    if not store.exists(dataset_id):
+        store.save(dataset_id, stream_aggregates(resolve(dataset_id)))
+    return store.load(dataset_id)
+
+@st.cache_data
+def load_sequential(dataset_id, version):
+    # Sequential test state stored with the aggregates, as of the same `version`
+    return AggregateStore().load_sequential(dataset_id)
+
+@st.cache_resource
+def load_sql_backend(dataset_id, filter_key=()):
+    # Embedded SQL mode: the dataset is ingested into a database file once, then queried
+    engine = default_engine()
+    backend = SqlBackend.from_csv(resolve(dataset_id), os.path.join(SQL_DIR, f"{dataset_id}.{engine}"), engine)
+    return backend.filtered(dict(filter_key)) if filter_key else backend
+
+@st.cache_data(show_spinner="Bootstrapping lift intervals...")
+def load_lift_intervals(state_key, _backend, _df=None):
+    # Bootstrap CIs once per dataset, mode, filters and aggregate version (state_key);
+    # spend is resampled from exact value counts whenever the rows or the database are at hand
+    histograms = spend_histograms(_df) if _df is not None else None
+    return _backend.lift_intervals(histograms)
+
+@st.cache_data(show_spinner="Running permutation tests...")
+def load_permutation_tests(state_key, permutations, _backend, _df=None):
+    # Unadjusted tests with spend permuted over its value counts, so changing the
+    # correction re-adjusts the cached p-values instead of redrawing the permutations
+    histograms_for = (lambda by: spend_histograms(_df, by)) if _df is not None else _backend.spend_histograms
+    return _backend.pairwise_tests(
+        SEGMENT_ATTRIBUTES, correction="none", permutations=permutations,
+        spend_histograms=attribute_histograms(histograms_for, SEGMENT_ATTRIBUTES),
+    )
+
+@st.cache_data
+def load_sample(dataset_id, nrows=10, filter_key=()):
+    if not filter_key:
+        return next(iter_campaign_chunks(resolve(dataset_id), chunksize=nrows))
+    chunks = iter_campaign_chunks(resolve(dataset_id), chunksize=10_000, filters=dict(filter_key))
+    return next((chunk.head(nrows) for chunk in chunks if len(chunk)), None)
+
 # Sidebar Configuration
 with st.sidebar:
     st.header("Configuration")
-    uploaded_file = st.file_uploader("Upload Dataset (CSV)", type="csv")
+    uploaded_file = st.file_uploader(
+        "Upload Dataset (CSV)", type=["csv", "gz", "zst"],
+        help="Plain .csv or compressed .csv.gz / .csv.zst extracts (decompressed while parsing)."
+    )
+    processing_mode = st.radio(
+        "Processing mode",
+        ["In-memory", "Streaming", "Embedded SQL", "Approximate"],
+        help="In-memory loads the whole dataset. Streaming aggregates the CSV chunk by chunk "
+             "(spend tiers come from a quantile sketch). Embedded SQL loads it into a local "
+             "DuckDB/SQLite file and answers every table with aggregate queries. Approximate "
+             "answers from a stratified sample first and switches to exact numbers when the "
+             "full aggregation finishes."
+    )
+    delta_file = None
+    if processing_mode == "Streaming":
+        delta_file = st.file_uploader(
+            "Append Daily Delta (CSV)", type=["csv", "gz", "zst"],
+            help="Fold new campaign responses into the stored aggregates without re-reading the full history."
+        )
+    workers = AGGREGATE_WORKERS
+    if processing_mode in ("In-memory", "Approximate"):
+        max_workers = os.cpu_count() or 1
+        workers = st.number_input(
+            "Aggregation workers", min_value=1, max_value=max_workers, value=min(AGGREGATE_WORKERS, max_workers),
+            help="Processes used to aggregate row shards of large datasets (shared memory, no pickling)."
+        )
+    # Filled in once the dataset is loaded, since the options come from its aggregates
+    filter_panel = st.container()
     st.markdown("---")
     st.markdown("**About this Dashboard**")
     st.info("""
@@ -164,30 +289,125 @@ with st.sidebar:
     """)
 
 # Load Data
-default_file = "digital_marketing_dataset.csv"
-if uploaded_file is not None:
-    df = load_data(uploaded_file)
-    st.sidebar.success("Custom dataset loaded")
-else:
-    try:
-        df = load_data(default_file)
-        st.sidebar.success("Default dataset loaded")
-    except FileNotFoundError:
+# CAMPAIGN_DATASET_PATH may point at a CSV or a Hive-style partitioned directory
+default_file = os.environ.get("CAMPAIGN_DATASET_PATH", "digital_marketing_dataset.csv")
+try:
+    if uploaded_file is not None:
+        # Fingerprint each upload once; later reruns look its id up by Streamlit's file_id
+        dataset_ids = st.session_state.setdefault("dataset_ids", {})
+        # Re-spill it if the upload cache evicted it since (it is shared with other sessions)
+        if uploaded_file.file_id not in dataset_ids or not is_available(dataset_ids[uploaded_file.file_id]):
+            dataset_ids[uploaded_file.file_id] = register_upload(uploaded_file, uploaded_file.name)
+        dataset_id = dataset_ids[uploaded_file.file_id]
+        source_label = "Custom dataset loaded"
+    else:
+        dataset_id = register_path(default_file)
+        source_label = "Default dataset loaded"
+
+    if processing_mode == "Streaming":
+        df = None
+        store = AggregateStore()
+        # Each upload is appended once per session: reruns while it stays in the uploader
+        # skip re-hashing it and reading the store (which would also find it already applied)
+        appended = st.session_state.setdefault("appended_deltas", set())
+        if delta_file is not None and (dataset_id, delta_file.file_id) not in appended:
+            if not store.exists(dataset_id):
+                store.save(dataset_id, stream_aggregates(resolve(dataset_id)))
+            # Deltas are recorded by content hash, so the same file uploaded again is a no-op
+            store.append(dataset_id, delta_file)
+            appended.add((dataset_id, delta_file.file_id))
+        backend = load_aggregates(dataset_id, store.version(dataset_id))
+    elif processing_mode == "Embedded SQL":
+        df = None
+        backend = load_sql_backend(dataset_id)
+    elif processing_mode == "Approximate" and not os.path.isdir(resolve(dataset_id)) and compression_for(resolve(dataset_id)) is None:
+        # Random blocks need a seekable plain CSV; other sources load exactly as in-memory
+        exact_job = start_exact_cube(dataset_id, ANALYSIS_COLUMNS, int(workers))
+        if exact_job.done() and exact_job.exception() is None:
+            df = load_data(dataset_id, columns=ANALYSIS_COLUMNS)
+            backend = exact_job.result()
+        else:
+            if exact_job.done():
+                # Drop only this failed job so the next rerun retries the build; builds for
+                # other datasets or sessions keep running, and until then the sample answers
+                start_exact_cube.clear(dataset_id, ANALYSIS_COLUMNS, int(workers))
+                st.error(f"Building the exact results failed ({exact_job.exception()}); showing the sample estimates.")
+            df = None
+            backend = load_sample_cube(dataset_id)
+    else:
+        df = load_data(dataset_id, columns=ANALYSIS_COLUMNS)
+        backend = load_cube(dataset_id, columns=ANALYSIS_COLUMNS, workers=int(workers))
+    st.sidebar.success(source_label)
+except (FileNotFoundError, DatasetUnavailable):
+    if uploaded_file is not None:
+        # The spilled upload was evicted between registering it and reading it
+        st.error("The uploaded dataset was removed from the upload cache while loading. Please rerun or upload it again.")
+    else:
         st.error(f"Default file '{default_file}' not found. Please upload a CSV file.")
+    st.stop()
+
+# Global cross-filters: every tab is recomputed for the selected rows.
+# Each combination is cached (row bitmap and cube in-memory, a filtered query
+# backend in SQL mode), so switching back to one already seen is instant.
+FILTER_LABELS = {
+    "channel": "Channel",
+    "address_category": "Address Category",
+    "acquired_in_last_year": "Acquired in Last Year",
+    "history_footwear": "Footwear Purchase History",
+    "history_apparel": "Apparel Purchase History",
+}
+filters = {}
+with filter_panel:
+    st.markdown("**Filters**")
+    for col in FILTER_COLUMNS:
+        chosen = st.multiselect(
+            FILTER_LABELS[col], backend.key_values(col),
+            format_func=(lambda value: "Yes" if value else "No") if col in FLAG_COLUMNS else str,
+            placeholder="All"
+        )
+        if chosen:
+            filters[col] = chosen
+filter_key = tuple((col, tuple(values)) for col, values in filters.items())
+
+# Sampled aggregates (Approximate mode, before the exact cube is ready)
+approximate = getattr(backend, "approximate", False)
+
+if filter_key:
+    if processing_mode == "Streaming" or approximate:
+        backend = backend.filter(filters)
+    elif processing_mode == "Embedded SQL":
+        backend = load_sql_backend(dataset_id, filter_key)
+    else:
+        backend = load_cube(dataset_id, columns=ANALYSIS_COLUMNS, workers=int(workers), filter_key=filter_key)
+        df = df.take(load_index(dataset_id).rows(load_selection(dataset_id, filter_key)))
+    if backend.n_rows == 0:
+        st.warning("No rows match the selected filters.")
         st.stop()
+    filter_panel.caption(f"{backend.n_rows:,} rows match the filters")
 
 # --- PRE-CALCULATIONS ---
-metrics = df.groupby("campaign_segment").agg(
-    user_count=("campaign_segment", "count"),
-    visit_rate=("visit", "mean"),
-    conversion_count=("conversion", "sum"),
-    conversion_rate=("conversion", "mean"),
-    avg_spend=("spend", "mean")
-).reset_index()
+# Every tab is answered from the backend's aggregates (the in-memory cube, streamed
+# aggregates or SQL queries), never by rescanning rows
+metrics = backend.metrics()
+totals = backend.totals()
+total_users = totals["user_count"]
+overall_conversion = totals["conversion_rate"]
+overall_spend = totals["avg_spend"]
 
 # Find winning campaign based on conversion
 winner = metrics.loc[metrics['conversion_rate'].idxmax()]
 
+# Approximate numbers are marked with "≈" and carry their confidence intervals
+mark = "≈ " if approximate else ""
+if approximate:
+    metric_intervals = backend.intervals()
+    total_intervals = backend.total_intervals()
+    st.info(
+        f"Approximate results from a stratified sample of {backend.sample_rows:,} rows: numbers marked ≈ are "
+        f"estimates with {CONFIDENCE:.0%} confidence intervals. They are replaced by exact numbers when the "
+        f"full aggregation finishes."
+    )
+
 # --- TABS LAYOUT ---
 tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
     "Executive Summary", 
@@ -204,14 +424,17 @@ with tab1:
     
     col_a, col_b, col_c = st.columns(3)
     with col_a:
-        st.metric(label="Total Users Targeted", value=f"{df.shape[0]:,}")
+        st.metric(label="Total Users Targeted", value=f"{mark}{total_users:,}",
+                  help="Estimated from the file size and the sampled rows" if approximate else None)
     with col_b:
-        st.metric(label="Overall Conversion Rate", value=f"{df['conversion'].mean():.2%}")
+        st.metric(label="Overall Conversion Rate", value=f"{mark}{overall_conversion:.2%}",
+                  help=f"± {total_intervals['conversion_rate']:.2%}" if approximate else None)
     with col_c:
-        st.metric(label="Avg Overall Spend", value=f"${df['spend'].mean():.2f}")
+        st.metric(label="Avg Overall Spend", value=f"{mark}${overall_spend:.2f}",
+                  help=f"± ${total_intervals['avg_spend']:.2f}" if approximate else None)
 
     st.markdown("Winning Strategy")
-    st.success(f"**{winner['campaign_segment']}** is the top performing campaign with a conversion rate of **{winner['conversion_rate']:.2%}**.")
+    st.success(f"**{winner['campaign_segment']}** is the top performing campaign with a conversion rate of **{mark}{winner['conversion_rate']:.2%}**.")
     
     st.markdown("""
     #### Key Insights:
@@ -225,16 +448,27 @@ with tab2:
     st.header("Dataset Overview")
     col1, col2 = st.columns([1, 2])
     
-    with col1:
-        st.markdown("#### Dataset Statistics")
-        st.write(df.describe())
-        st.markdown("#### Missing Values")
-        st.write(df.isnull().sum())
-    
-    with col2:
-        st.markdown("#### Sample Data")
-        st.dataframe(df.head(10), use_container_width=True)
-        st.caption(f"Shape: {df.shape[0]} rows, {df.shape[1]} columns")
+    if df is not None:
+        with col1:
+            st.markdown("#### Dataset Statistics")
+            st.write(df.describe())
+            st.markdown("#### Missing Values")
+            st.write(df.isnull().sum())
+        
+        with col2:
+            st.markdown("#### Sample Data")
+            st.dataframe(load_sample(dataset_id, filter_key=filter_key), use_container_width=True)
+            st.caption(f"Rows: {len(df):,}")
+    else:
+        with col1:
+            st.markdown("#### Dataset Statistics")
+            st.write(backend.describe())
+            st.caption(f"{processing_mode} mode: statistics are computed from per-segment aggregates.")
+        
+        with col2:
+            st.markdown("#### Sample Data")
+            st.dataframe(load_sample(dataset_id, filter_key=filter_key), use_container_width=True)
+            st.caption(f"Rows: {backend.n_rows:,}")
 
 # --- TAB 3: CAMPAIGN PERFORMANCE ---
 with tab3:
@@ -243,11 +477,21 @@ with tab3:
 
     # Main Metrics Table
     st.subheader("Summary Table")
-    st.dataframe(metrics.style.format({
-        "visit_rate": "{:.2%}",
-        "conversion_rate": "{:.2%}",
-        "avg_spend": "${:.2f}"
-    }), use_container_width=True)
+    if approximate:
+        st.caption(f"≈ Estimated from the sample; ± columns are {CONFIDENCE:.0%} confidence half-widths.")
+        table = metrics.merge(metric_intervals, on="campaign_segment", suffixes=("", " ±"))
+        st.dataframe(table.style.format({
+            "visit_rate": "≈ {:.2%}", "visit_rate ±": "{:.2%}",
+            "conversion_rate": "≈ {:.2%}", "conversion_rate ±": "{:.2%}",
+            "avg_spend": "≈ ${:.2f}", "avg_spend ±": "${:.2f}",
+            "user_count": "≈ {:,}", "conversion_count": "≈ {:,}",
+        }), use_container_width=True)
+    else:
+        st.dataframe(metrics.style.format({
+            "visit_rate": "{:.2%}",
+            "conversion_rate": "{:.2%}",
+            "avg_spend": "${:.2f}"
+        }), use_container_width=True)
 
     # Visualizations
     st.subheader("Visual Comparisons")
@@ -288,53 +532,69 @@ with tab3:
     for spine in axes[2].spines.values():
         spine.set_edgecolor(text_color)
 
+    if approximate:
+        # Confidence intervals of the sampled estimates
+        for ax, col in zip(axes, ["visit_rate", "conversion_rate", "avg_spend"]):
+            ax.errorbar(range(len(metrics)), metrics[col], yerr=metric_intervals[col], fmt="none", ecolor=text_color, capsize=6)
+
     st.pyplot(fig)
-    st.caption("Bar charts showing key performance indicators by campaign segment.")
+    st.caption("Bar charts showing key performance indicators by campaign segment."
+               + (f" Error bars: {CONFIDENCE:.0%} confidence intervals of the sampled estimates." if approximate else ""))
 
 # --- TAB 4: STATISTICAL SIGNIFICANCE ---
 with tab4:
     st.header("Statistical Significance Testing")
     st.markdown("""
     We use **Chi-Square Tests** to determine if the differences in visit and conversion rates are statistically significant, 
-    and **T-Tests** for spending differences.
+    and **T-Tests** or a **Permutation Test** for spending differences.
     
     - **Null Hypothesis (H0)**: There is no difference between the groups.
     - **P-Value < 0.05**: We reject H0 → The difference is **Significant**.
     """)
 
+    CORRECTION_LABELS = {"Holm": "holm", "Benjamini-Hochberg": "bh", "None": "none"}
+    # The permutation test needs the spend values, not just their sums
+    exact_spend = df is not None or processing_mode == "Embedded SQL"
+    col_test, col_correction = st.columns(2)
+    with col_test:
+        spend_test = st.radio(
+            "Spend test", ["Student", "Welch"] + (["Permutation"] if exact_spend else []), horizontal=True,
+            help="Student's t-test pools the two variances; Welch's does not assume they are equal. "
+                 "The permutation test shuffles campaign labels, so it does not rely on spend being "
+                 "roughly normal (most users spend nothing)."
+        )
+        if spend_test == "Permutation":
+            permutations = st.number_input(
+                "Permutations", min_value=1_000, max_value=100_000, value=PERMUTATIONS, step=1_000,
+                help="More permutations resolve smaller p-values, at proportionally more compute."
+            )
+    with col_correction:
+        correction_label = st.radio(
+            "Multiple-testing correction", list(CORRECTION_LABELS), horizontal=True,
+            help="Holm controls the chance of any false positive; Benjamini-Hochberg the expected share of false positives."
+        )
+
     # --- Calculations ---
-    footwear = df[df["campaign_segment"] == "Footwear E-Mail"]
-    apparel = df[df["campaign_segment"] == "Apparel E-Mail"]
-    no_email = df[df["campaign_segment"] == "No E-Mail"]
-
-    def run_chi2(group1, group2, metric="visit"):
-        contingency = [
-            [group1[metric].sum(), group1.shape[0] - group1[metric].sum()],
-            [group2[metric].sum(), group2.shape[0] - group2[metric].sum()]
-        ]
-        stat, p, _, _ = chi2_contingency(contingency)
-        return p
-
-    comparisons = [
-        ("Apparel", "Footwear", apparel, footwear),
-        ("Apparel", "No Email", apparel, no_email),
-        ("Footwear", "No Email", footwear, no_email)
-    ]
-    
-    results = []
-    for label1, label2, g1, g2 in comparisons:
-        p_visit = run_chi2(g1, g2, "visit")
-        p_conv = run_chi2(g1, g2, "conversion")
-        t_stat, p_spend = ttest_ind(g1["spend"], g2["spend"], nan_policy='omit')
-        
-        results.append({
-            "Comparison": f"{label1} vs {label2}",
-            "Visit Rate P-Value": p_visit,
-            "Conversion Rate P-Value": p_conv,
-            "Spend P-Value": p_spend
-        })
-    
-    results_df = pd.DataFrame(results)
+    # Every campaign pair, overall and within each segment attribute level, is tested
+    # in one batch from per-segment counts, sums and sums of squares.
+    state_key = (
+        dataset_id, processing_mode, filter_key, approximate,
+        store.version(dataset_id) if processing_mode == "Streaming" else None,
+    )
+    if spend_test == "Permutation":
+        tests = adjust_tests(
+            load_permutation_tests(state_key, int(permutations), backend, df), CORRECTION_LABELS[correction_label]
+        )
+    else:
+        tests = backend.pairwise_tests(
+            SEGMENT_ATTRIBUTES, equal_var=spend_test == "Student", correction=CORRECTION_LABELS[correction_label]
+        )
+    p_columns = {"visit": "Visit Rate P-Value", "conversion": "Conversion Rate P-Value", "spend": "Spend P-Value"}
+    results_df = tests.assign(
+        level=tests["level"].astype(str),
+        Comparison=tests["segment_a"] + " vs " + tests["segment_b"],
+    ).pivot_table(index=["attribute", "level", "Comparison"], columns="metric", values="p_adjusted")
+    results_df = results_df[list(p_columns)].rename(columns=p_columns).rename_axis(columns=None)
 
     def highlight_significant(val):
         theme = st.session_state.get('theme', 'light')
@@ -349,13 +609,82 @@ with tab4:
                 return f'background-color: {color}; color: #000000'
         return ''
 
+    def show_p_values(table):
+        st.dataframe(
+            table.style
+            .applymap(highlight_significant, subset=list(p_columns.values()))
+            .format(mark + "{:.4f}", subset=list(p_columns.values())),
+            use_container_width=True
+        )
+
+    # Bootstrap lift intervals for each campaign pair, next to its p-values
+    lifts = load_lift_intervals(state_key, backend, df)
+    lift_columns = {
+        "conversion_rate": f"Conversion Lift ({LIFT_CONFIDENCE:.0%} CI)",
+        "avg_spend": f"Spend Lift ({LIFT_CONFIDENCE:.0%} CI)",
+    }
+    lifts = lifts.assign(
+        Comparison=lifts["segment_a"] + " vs " + lifts["segment_b"],
+        interval=[f"{lift:+.1%} [{lower:+.1%}, {upper:+.1%}]" for lift, lower, upper in
+                  lifts[["lift", "lower", "upper"]].itertuples(index=False)],
+    ).pivot(index="Comparison", columns="metric", values="interval")
+
     st.subheader("Test Results")
-    st.dataframe(
-        results_df.style
-        .applymap(highlight_significant, subset=["Visit Rate P-Value", "Conversion Rate P-Value", "Spend P-Value"])
-        .format("{:.4f}", subset=["Visit Rate P-Value", "Conversion Rate P-Value", "Spend P-Value"]),
-        use_container_width=True
+    show_p_values(results_df.loc[("All", "All")].join(lifts[list(lift_columns)].rename(columns=lift_columns)).reset_index())
+    st.caption(
+        f"Lift is the first campaign's conversion rate or average spend relative to the second's. Intervals are "
+        f"bootstrap percentiles over {REPLICATES:,} replicates drawn from the per-segment counts"
+        + ("." if exact_spend
+           else "; spend replicates use a normal approximation, as only its sums are kept in this mode.")
+    )
+
+    st.subheader("By Segment Attribute")
+    show_p_values(
+        results_df.drop(index="All", level="attribute").reset_index()
+        .rename(columns={"attribute": "Attribute", "level": "Level"})
+    )
+    st.caption(
+        f"{len(tests)} tests. "
+        + (f"Spend p-values come from {int(permutations):,} label permutations, approximate where a pair has more than "
+           f"{PERMUTATION_BINS} distinct spend values (those are permuted in log-spaced buckets). "
+           if spend_test == "Permutation" else "")
+        + ("P-values are unadjusted." if correction_label == "None"
+           else f"P-values are {correction_label}-adjusted across all of them.")
+        + (f" ≈ These tests use only the {backend.sample_rows:,} sampled rows, so they have less power than the "
+           "exact tests that replace them once the full data is processed." if approximate else "")
     )
+
+    if processing_mode == "Streaming":
+        # Always-valid p-values, advanced once per appended delta from the stored running state,
+        # so monitoring a live campaign never rescans history or inflates false positives
+        st.subheader("Sequential Monitoring")
+        sequential = load_sequential(dataset_id, store.version(dataset_id))
+        if sequential is None:
+            st.caption("Sequential tests start with the next appended delta file.")
+        else:
+            signals = sequential_signals(sequential, CORRECTION_LABELS[correction_label])
+            overall = signals[signals["attribute"] == "All"]
+            metric_labels = {"visit": "Visit Rate", "conversion": "Conversion Rate", "spend": "Spend"}
+            sequential_df = pd.DataFrame({
+                "Comparison": overall["segment_a"] + " vs " + overall["segment_b"],
+                "Metric": overall["metric"].map(metric_labels),
+                "Difference": overall["difference"],
+                "Always-Valid P-Value": overall["p_adjusted"],
+                "Signal": overall["signal"],
+            }).reset_index(drop=True)
+            st.dataframe(
+                sequential_df.style
+                .applymap(highlight_significant, subset=["Always-Valid P-Value"])
+                .format({"Difference": "{:+.4f}", "Always-Valid P-Value": "{:.4f}"}),
+                use_container_width=True
+            )
+            st.caption(
+                f"Mixture sequential probability ratio tests over {int(signals['looks'].max())} looks "
+                "(the initial load and each appended delta), on every ingested row regardless of the sidebar filters. "
+                "These p-values stay valid however often they are checked: **Stop** once a difference is established, "
+                f"otherwise keep the campaign running. {len(signals)} comparisons are monitored"
+                + ("." if correction_label == "None" else f", {correction_label}-adjusted together.")
+            )
     
     st.info("**Interpretation**: Green cells (p < 0.05) indicate that the marketing campaign had a real, non-random impact compared to the other group.")
 
@@ -364,11 +693,17 @@ with tab5:
     st.header("Segmentation Analysis")
     st.markdown("Analyze how different customer groups reacted to the campaigns.")
 
+    if approximate:
+        st.caption("≈ Approximate: rates and spend below are computed from the stratified sample.")
+
     col1, col2 = st.columns([1, 3])
     with col1:
         segment_col = st.selectbox("Select Segment Attribute", 
-                                   ["acquired_in_last_year", "address_category", "history_footwear", "history_apparel"],
+                                   SEGMENT_ATTRIBUTES,
                                    format_func=lambda x: x.replace("_", " ").title())
+        cross_col = st.selectbox("Cross With",
+                                 [None] + [col for col in SEGMENT_ATTRIBUTES if col != segment_col],
+                                 format_func=lambda x: "None" if x is None else x.replace("_", " ").title())
         
         st.markdown("**Attribute Description:**")
         if segment_col == "acquired_in_last_year":
@@ -377,76 +712,109 @@ with tab5:
             st.write("0: Never bought footwear\n1: Bought footwear before")
 
     with col2:
-        segment_metrics = df.groupby(["campaign_segment", segment_col]).agg(
-            conversion_rate=("conversion", "mean"),
-            avg_spend=("spend", "mean")
-        ).reset_index()
-
         # Theme-aware styling
         text_color = "#fafafa" if st.session_state.theme == "dark" else "#262730"
 
         fig2, ax2 = plt.subplots(1, 2, figsize=(14, 5))
         fig2.patch.set_facecolor('none')
+
+        if cross_col is not None:
+            # Two-way slice of the cube: one heatmap row per attribute pair, one column per campaign
+            segment_metrics = backend.segment_metrics(segment_col, cross_col)
+            pair_label = f"{segment_col.replace('_', ' ').title()} x {cross_col.replace('_', ' ').title()}"
+            for ax, metric, title, fmt, cmap in [
+                (ax2[0], "conversion_rate", "Conversion Rate", ".2%", "cividis"),
+                (ax2[1], "avg_spend", "Avg Spend", ".2f", "magma"),
+            ]:
+                table = segment_metrics.pivot_table(index=[segment_col, cross_col], columns="campaign_segment", values=metric)
+                sns.heatmap(table, annot=True, fmt=fmt, cmap=cmap, cbar=False, ax=ax)
+                ax.set_title(f"{title} by {pair_label}", color=text_color)
+                ax.set_xlabel("Campaign", color=text_color)
+                ax.set_ylabel(pair_label, color=text_color)
+                ax.tick_params(colors=text_color)
+                ax.set_facecolor('none')
+                for spine in ax.spines.values():
+                    spine.set_edgecolor(text_color)
+            st.pyplot(fig2)
+        else:
+            segment_metrics = backend.segment_metrics(segment_col)
+
+            sns.barplot(data=segment_metrics, x=segment_col, y="conversion_rate", hue="campaign_segment", ax=ax2[0], palette="cividis")
+            ax2[0].set_title(f"Conversion Rate by {segment_col.replace('_', ' ').title()}", color=text_color)
+            ax2[0].set_xlabel(segment_col.replace('_', ' ').title(), color=text_color)
+            ax2[0].set_ylabel("Conversion Rate", color=text_color)
+            ax2[0].tick_params(colors=text_color)
+            ax2[0].set_facecolor('none')
+            for spine in ax2[0].spines.values():
+                spine.set_edgecolor(text_color)
+            # Update legend text color
+            if ax2[0].legend_:
+                plt.setp(ax2[0].legend_.get_texts(), color=text_color)
         
-        sns.barplot(data=segment_metrics, x=segment_col, y="conversion_rate", hue="campaign_segment", ax=ax2[0], palette="cividis")
-        ax2[0].set_title(f"Conversion Rate by {segment_col.replace('_', ' ').title()}", color=text_color)
-        ax2[0].set_xlabel(segment_col.replace('_', ' ').title(), color=text_color)
-        ax2[0].set_ylabel("Conversion Rate", color=text_color)
-        ax2[0].tick_params(colors=text_color)
-        ax2[0].set_facecolor('none')
-        for spine in ax2[0].spines.values():
-            spine.set_edgecolor(text_color)
-        # Update legend text color
-        if ax2[0].legend_:
-            plt.setp(ax2[0].legend_.get_texts(), color=text_color)
-        
-        sns.barplot(data=segment_metrics, x=segment_col, y="avg_spend", hue="campaign_segment", ax=ax2[1], palette="magma")
-        ax2[1].set_title(f"Avg Spend by {segment_col.replace('_', ' ').title()}", color=text_color)
-        ax2[1].set_xlabel(segment_col.replace('_', ' ').title(), color=text_color)
-        ax2[1].set_ylabel("Average Spend", color=text_color)
-        ax2[1].tick_params(colors=text_color)
-        ax2[1].set_facecolor('none')
-        for spine in ax2[1].spines.values():
-            spine.set_edgecolor(text_color)
-        if ax2[1].legend_:
-            plt.setp(ax2[1].legend_.get_texts(), color=text_color)
+            sns.barplot(data=segment_metrics, x=segment_col, y="avg_spend", hue="campaign_segment", ax=ax2[1], palette="magma")
+            ax2[1].set_title(f"Avg Spend by {segment_col.replace('_', ' ').title()}", color=text_color)
+            ax2[1].set_xlabel(segment_col.replace('_', ' ').title(), color=text_color)
+            ax2[1].set_ylabel("Average Spend", color=text_color)
+            ax2[1].tick_params(colors=text_color)
+            ax2[1].set_facecolor('none')
+            for spine in ax2[1].spines.values():
+                spine.set_edgecolor(text_color)
+            if ax2[1].legend_:
+                plt.setp(ax2[1].legend_.get_texts(), color=text_color)
         
-        st.pyplot(fig2)
+            st.pyplot(fig2)
 
 # --- TAB 6: CUSTOMER PROFILING ---
 with tab6:
     st.header("Customer Spend Profiling")
     st.markdown("Breakdown of performance based on historical customer value (High/Medium/Low spenders).")
 
-    try:
-        # Dynamic binning based on quartiles/distribution
-        df['spend_group'] = pd.qcut(df['history_spend'], q=3, labels=['Low Value', 'Medium Value', 'High Value'])
+    if processing_mode == "Streaming" and backend.tiers is None:
+        if filters and set(filters) != {"campaign_segment"}:
+            st.info("Streamed spend tiers are kept per campaign segment only. Clear the attribute filters to see the Spend Profile.")
+        else:
+            st.info("These stored aggregates predate spend tiers in streaming mode. Clear `.cache/aggregates` to rebuild them with a `history_spend` sketch.")
+    else:
+        try:
+            # Terciles of history_spend (pd.qcut in the cube, quantile queries in SQL, a quantile sketch when streaming)
+            spend_metrics = backend.spend_profile()
+            if processing_mode == "Streaming":
+                st.caption(
+                    f"Tier cut points come from a `history_spend` quantile sketch "
+                    f"(about {SPEND_SKETCH.relative_accuracy:.0%} relative error, see `quantile_sketch.py`)."
+                )
+
+            # Theme-aware styling
+            text_color = "#fafafa" if st.session_state.theme == "dark" else "#262730"
+
+            fig3, ax3 = plt.subplots(figsize=(12, 6))
+            fig3.patch.set_facecolor('none')
+            sns.barplot(data=spend_metrics, x='spend_group', y='conversion_rate', hue='campaign_segment', palette='coolwarm', ax=ax3)
+            ax3.set_title("Conversion Rate by Historical Spend Level", fontsize=15, color=text_color)
+            ax3.set_ylabel("Conversion Rate", color=text_color)
+            ax3.set_xlabel("Customer Value Tier", color=text_color)
+            ax3.tick_params(colors=text_color)
+            ax3.set_facecolor('none')
+            for spine in ax3.spines.values():
+                spine.set_edgecolor(text_color)
+            if ax3.legend_:
+                plt.setp(ax3.legend_.get_texts(), color=text_color)
         
-        spend_metrics = df.groupby(['campaign_segment', 'spend_group']).agg(
-            conversion_rate=('conversion', 'mean')
-        ).reset_index()
-
-        # Theme-aware styling
-        text_color = "#fafafa" if st.session_state.theme == "dark" else "#262730"
-
-        fig3, ax3 = plt.subplots(figsize=(12, 6))
-        fig3.patch.set_facecolor('none')
-        sns.barplot(data=spend_metrics, x='spend_group', y='conversion_rate', hue='campaign_segment', palette='coolwarm', ax=ax3)
-        ax3.set_title("Conversion Rate by Historical Spend Level", fontsize=15, color=text_color)
-        ax3.set_ylabel("Conversion Rate", color=text_color)
-        ax3.set_xlabel("Customer Value Tier", color=text_color)
-        ax3.tick_params(colors=text_color)
-        ax3.set_facecolor('none')
-        for spine in ax3.spines.values():
-            spine.set_edgecolor(text_color)
-        if ax3.legend_:
-            plt.setp(ax3.legend_.get_texts(), color=text_color)
+            st.pyplot(fig3)
         
-        st.pyplot(fig3)
-        
-        st.markdown("""
-        **Insight**: This chart reveals if we are effectively upselling high-value customers or activating low-value ones.
-        """)
-
-    except Exception as e:
-        st.error(f"Error in profiling analysis: {e}")
+            st.markdown("""
+            **Insight**: This chart reveals if we are effectively upselling high-value customers or activating low-value ones.
+            """)
+
+        except Exception as e:
+            st.error(f"Error in profiling analysis: {e}")
+
+# Approximate mode: poll for the exact cube and rerun the page once it is ready
+if approximate:
+    @st.fragment(run_every=1)
+    def refresh_when_exact():
+        # A failed build is retried on the next interaction, not polled
+        if exact_job.done() and exact_job.exception() is None:
+            st.rerun()
+
+    refresh_when_exact()
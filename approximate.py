@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import t
+
+from aggregates import CUBE_KEYS, GROUP_KEYS, SPEND_TIERS, VALUE_COLUMNS, CampaignAggregates
+from data_loader import sample_csv_blocks
+from metric_definitions import CAMPAIGN_METRICS, evaluate, evaluate_totals
+
+# Approximate answers for large CSVs while the exact aggregates are built.
+# Many small random blocks of the file give a cluster sample of rows and an
+# estimate of the total row count; at most SAMPLE_PER_SEGMENT rows per
+# campaign_segment are kept, and each segment's rows are weighted up to its
+# estimated population. Rates and means are read from the sample cells as
+# usual and counts are scaled by the weights. Rows of one block are alike when
+# the file is sorted or written in batches, so the blocks, not the rows, are
+# the sampling units: the cells keep a "block" key and the confidence
+# intervals come from the spread of the per-block sums.
+SAMPLE_PER_SEGMENT = 20_000
+SAMPLE_BLOCKS = 1024
+SAMPLE_BLOCK_SIZE = 4 * 1024
+CONFIDENCE = 0.95
+
+
+def stratified_sample(df, per_segment=SAMPLE_PER_SEGMENT, seed=0):
+    """Up to per_segment random rows from each campaign_segment."""
+    shuffled = df.iloc[np.random.default_rng(seed).permutation(len(df))]
+    keep = shuffled.groupby("campaign_segment", observed=True).cumcount() < per_segment
+    return shuffled[keep.to_numpy()]
+
+
+class SampledAggregates(CampaignAggregates):
+    """CampaignAggregates of a stratified sample, scaled to the estimated population."""
+
+    approximate = True
+
+    def __init__(self, keys=GROUP_KEYS, cells=None, weights=None, n_blocks=1):
+        super().__init__(keys, cells)
+        # Estimated population rows per sampled row, by campaign_segment.
+        self.weights = dict(weights or {})
+        # Sampled blocks, counting those left without rows by the filters.
+        self.n_blocks = n_blocks
+
+    def _segment_cells(self):
+        cells = self.rollup(["campaign_segment"])
+        return cells, cells.index.map(self.weights).to_numpy(dtype=np.float64)
+
+    def _population_cells(self):
+        # Statistics scaled to the population; rates and means within a segment are unchanged.
+        cells, weights = self._segment_cells()
+        return cells.mul(weights, axis=0)
+
+    @property
+    def n_rows(self):
+        return int(round(self._population_cells()["n"].sum()))
+
+    @property
+    def sample_rows(self):
+        return int(self.cells["n"].sum())
+
+    def filter(self, filters):
+        filtered = super().filter(filters)
+        return type(self)(self.keys, filtered.cells, self.weights, self.n_blocks)
+
+    def totals(self):
+        return evaluate_totals(self._population_cells())
+
+    def metrics(self):
+        return evaluate(self._population_cells(), CAMPAIGN_METRICS).reset_index()
+
+    def intervals(self, confidence=CONFIDENCE):
+        """Half-widths of the confidence intervals for the rates and avg_spend in metrics()."""
+        cells, weights = self._segment_cells()
+        blocks = self.rollup(["campaign_segment", "block"])
+        segments = blocks.index.get_level_values("campaign_segment")
+        m = max(self.n_blocks, 2)
+        # Finite population correction: a segment sampled in full has no sampling error.
+        fpc = np.clip(1 - 1 / np.maximum(weights, 1), 0, 1)
+        quantile = t.ppf(0.5 + confidence / 2, m - 1)
+        out = pd.DataFrame({"campaign_segment": cells.index})
+        for name, (total, count) in {"visit_rate": ("visit", "n"), "conversion_rate": ("conversion", "n"),
+                                     "avg_spend": ("spend", "spend_n")}.items():
+            # Ratio estimator over clusters: spread of each block's residual total around the segment ratio.
+            ratio = cells[total] / cells[count]
+            residual = blocks[total] - segments.map(ratio).to_numpy() * blocks[count]
+            spread = (residual ** 2).groupby(level="campaign_segment", observed=True).sum().reindex(cells.index)
+            var = fpc * m / (m - 1) * spread.to_numpy() / cells[count].to_numpy() ** 2
+            out[name] = quantile * np.sqrt(var)
+        return out
+
+    def total_intervals(self, confidence=CONFIDENCE):
+        """Half-widths for the stratified overall conversion_rate and avg_spend in totals()."""
+        cells, weights = self._segment_cells()
+        segment = self.intervals(confidence)
+        share = cells["n"].to_numpy() * weights
+        spend_share = cells["spend_n"].to_numpy() * weights
+        return {
+            "conversion_rate": np.sqrt(((share / share.sum()) ** 2 * segment["conversion_rate"].to_numpy() ** 2).sum()),
+            "avg_spend": np.sqrt(((spend_share / spend_share.sum()) ** 2 * segment["avg_spend"].to_numpy() ** 2).sum()),
+        }
+
+
+def sample_cube(path, per_segment=SAMPLE_PER_SEGMENT, n_blocks=SAMPLE_BLOCKS, seed=0):
+    """SampledAggregates over CUBE_KEYS from random blocks of a plain CSV file."""
+    rows, estimated_rows, block = sample_csv_blocks(
+        path, GROUP_KEYS + ["history_spend"] + VALUE_COLUMNS, n_blocks, SAMPLE_BLOCK_SIZE, seed)
+    sample = stratified_sample(rows.assign(block=block), per_segment, seed)
+    shares = rows["campaign_segment"].value_counts(normalize=True)
+    counts = sample["campaign_segment"].value_counts()
+    weights = {segment: estimated_rows * shares[segment] / count for segment, count in counts.items() if count}
+    # Tier cut points from every sampled row, before the strata are capped.
+    low, high = rows["history_spend"].quantile([1 / 3, 2 / 3])
+    tiers = pd.cut(sample["history_spend"], [-np.inf, low, high, np.inf], labels=SPEND_TIERS)
+    cube = SampledAggregates(CUBE_KEYS + ["block"], weights=weights, n_blocks=min(n_blocks, len(rows)))
+    cube.update(sample.assign(spend_group=tiers))
+    return cube
@@ -0,0 +1,63 @@
+"""Bootstrap lift intervals: count-based replicates vs. resampling rows.
+
+Run from the repository root:
+    python -m benchmarks.bench_bootstrap --rows 10000000 --replicates 10000
+"""
+import argparse
+import os
+
+import numpy as np
+
+from aggregates import CampaignAggregates
+from bootstrap import lift_intervals, spend_histograms
+from benchmarks.common import timed
+from benchmarks.synthetic import synthetic_frame
+
+
+def row_replicates(df, replicates, seed=0):
+    # Conversion rate and mean spend per segment from resampled rows, the reference bootstrap.
+    rng = np.random.default_rng(seed)
+    groups = {segment: group[["conversion", "spend"]].to_numpy(np.float64)
+              for segment, group in df.groupby("campaign_segment", observed=True)}
+    return {
+        segment: np.array([rows[rng.integers(0, len(rows), len(rows))].mean(axis=0) for _ in range(replicates)])
+        for segment, rows in groups.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--replicates", type=int, default=10_000)
+    parser.add_argument("--row-replicates", type=int, default=20, help="row-resampling replicates to time")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    stats = CampaignAggregates.from_frame(df, ["campaign_segment"]).rollup(["campaign_segment"])
+    elapsed, histograms = timed(spend_histograms, df)
+    distinct = max(len(values) for values, _ in histograms.values())
+    print(f"{args.rows:,} rows; spend histograms in {elapsed:.2f}s (up to {distinct:,} distinct values per segment)")
+
+    row_time, _ = timed(row_replicates, df, args.row_replicates)
+    per_replicate = row_time / args.row_replicates
+    print(f"row resampling: {per_replicate:.3f}s per replicate, ~{per_replicate * args.replicates:,.0f}s for {args.replicates:,}")
+
+    print(f"{'workers':>7} {'seconds':>8} {'speed-up':>8}")
+    baseline = expected = None
+    workers = 1
+    while True:
+        elapsed, intervals = timed(lift_intervals, stats, histograms, args.replicates, workers=workers)
+        if expected is None:
+            baseline, expected = elapsed, intervals
+        # Batches are seeded independently of the worker count, so the intervals are identical.
+        assert np.array_equal(expected[["lower", "upper"]].to_numpy(), intervals[["lower", "upper"]].to_numpy())
+        print(f"{workers:>7} {elapsed:>8.2f} {baseline / elapsed:>8.2f}")
+        if workers >= args.max_workers:
+            break
+        workers = min(workers * 2, args.max_workers)
+    print(expected.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
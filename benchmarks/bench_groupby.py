@@ -0,0 +1,99 @@
+"""Group aggregation: pandas groupby vs. the np.bincount cell kernel.
+
+Run from the repository root:
+    python -m benchmarks.bench_groupby --rows 10000000
+"""
+import argparse
+
+import numpy as np
+
+from aggregates import GROUP_KEYS, CampaignAggregates, cell_statistics, grouped_metrics
+from metric_definitions import SEGMENT_METRICS
+from benchmarks.common import timed
+from benchmarks.synthetic import synthetic_frame
+
+# The attributes the notebook's segment_analysis is called with.
+NOTEBOOK_ATTRIBUTES = ["acquired_in_last_year", "address_category", "history_footwear", "history_apparel"]
+
+
+def pandas_metrics(df):
+    # The per-campaign table as app.py computed it before the cube.
+    return df.groupby("campaign_segment", observed=True).agg(
+        user_count=("campaign_segment", "count"),
+        visit_rate=("visit", "mean"),
+        conversion_count=("conversion", "sum"),
+        conversion_rate=("conversion", "mean"),
+        avg_spend=("spend", "mean"),
+    ).reset_index()
+
+
+def pandas_segment_analysis(df):
+    # The notebook's segment_analysis, once per segment attribute.
+    return [
+        df.groupby(["campaign_segment", col], observed=True).agg(
+            visit_rate=("visit", "mean"),
+            conversion_rate=("conversion", "mean"),
+            avg_spend=("spend", "mean"),
+        ).reset_index()
+        for col in NOTEBOOK_ATTRIBUTES
+    ]
+
+
+def pandas_cells(df):
+    spend = df["spend"].astype("float64")
+    stats = df[GROUP_KEYS].assign(
+        n=1.0,
+        visit=df["visit"].astype("float64"),
+        conversion=df["conversion"].astype("float64"),
+        spend_n=spend.notna().astype("float64"),
+        spend=spend,
+        spend_sq=spend ** 2,
+    )
+    return stats.groupby(GROUP_KEYS, observed=True, dropna=False).sum()
+
+
+def kernel_metrics(df):
+    return CampaignAggregates.from_frame(df, ["campaign_segment"]).metrics()
+
+
+def kernel_segment_analysis(df):
+    # Every attribute's table from one pass, as the notebook now does.
+    return grouped_metrics(df, [["campaign_segment", col] for col in NOTEBOOK_ATTRIBUTES], SEGMENT_METRICS)
+
+
+def check_close(expected, actual, label):
+    numeric = expected.select_dtypes("number").columns
+    for col in numeric.intersection(actual.columns):
+        # float32 spend is summed in float64 by the kernel, so means agree to ~1e-6 relative.
+        assert np.allclose(expected[col].to_numpy(float), actual[col].to_numpy(float), rtol=1e-5), (label, col)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    print(f"{args.rows:,} rows")
+    print(f"{'table':<18} {'pandas':>8} {'bincount':>8} {'speed-up':>8}")
+
+    cases = [
+        ("metrics", pandas_metrics, kernel_metrics),
+        ("segment_analysis", pandas_segment_analysis, kernel_segment_analysis),
+        ("all group keys", pandas_cells, lambda frame: cell_statistics(frame, GROUP_KEYS)),
+    ]
+    for label, baseline_fn, kernel_fn in cases:
+        baseline, expected = timed(baseline_fn, df)
+        elapsed, actual = timed(kernel_fn, df)
+        if isinstance(expected, list):
+            for exp, act in zip(expected, actual):
+                check_close(exp, act, label)
+        elif label == "all group keys":
+            check_close(expected.sort_index(), actual.sort_index(), label)
+        else:
+            check_close(expected, actual, label)
+        print(f"{label:<18} {baseline:>8.2f} {elapsed:>8.2f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Ingest scaling on a synthetic campaign CSV.
+
+Run from the repository root:
+    python -m benchmarks.bench_ingest --rows 10000000
+"""
+import argparse
+import os
+import tempfile
+
+from data_loader import read_campaign_csv, read_campaign_csv_parallel
+from benchmarks.common import timed
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "campaign_synthetic_{rows}.csv"))
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    path = write_synthetic_csv(args.path.format(rows=args.rows), args.rows)
+    print(f"{args.rows:,} rows, {os.path.getsize(path) / 1e6:,.0f} MB: {path}")
+
+    baseline, expected = timed(read_campaign_csv, path)
+    print(f"{'engine':<8} {'workers':>7} {'seconds':>8} {'speed-up':>8}")
+    print(f"{'pandas':<8} {1:>7} {baseline:>8.2f} {1.0:>8.2f}")
+
+    workers = 1
+    counts = []
+    while workers < args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(args.max_workers)
+
+    # The Arrow reader is either single-threaded or uses its whole shared pool.
+    for engine, engine_counts in (("arrow", sorted({1, args.max_workers})), ("ranges", counts)):
+        for n in engine_counts:
+            elapsed, df = timed(read_campaign_csv_parallel, path, workers=n, engine=engine)
+            assert df.equals(expected), f"{engine} with {n} workers produced a different frame"
+            print(f"{engine:<8} {n:>7} {elapsed:>8.2f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""All-pairs significance: one scipy call per test vs. the batched engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_pairwise --arms 30 --levels 20
+"""
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency, ttest_ind_from_stats
+
+from significance import adjust_pvalues, pairwise_tests, summary_from_sums
+from benchmarks.common import timed
+
+
+def synthetic_stats(arms, levels, seed=0):
+    """Cell statistics for `arms` campaign segments within each of `levels` attribute levels."""
+    rng = np.random.default_rng(seed)
+    size = arms * levels
+    n = rng.integers(2_000, 50_000, size).astype(np.float64)
+    spend_n = n.copy()
+    mean = rng.uniform(0.5, 2.0, size)
+    std = rng.uniform(10, 20, size)
+    return pd.DataFrame({
+        "level": np.repeat(np.arange(levels), arms),
+        "campaign_segment": np.tile([f"Arm {i:03d}" for i in range(arms)], levels),
+        "n": n,
+        "visit": rng.binomial(n.astype(np.int64), rng.uniform(0.05, 0.2, size)).astype(np.float64),
+        "conversion": rng.binomial(n.astype(np.int64), rng.uniform(0.002, 0.02, size)).astype(np.float64),
+        "spend_n": spend_n,
+        "spend": mean * spend_n,
+        "spend_sq": (std ** 2 * (spend_n - 1) + spend_n * mean ** 2),
+    })
+
+
+def scipy_loop(stats):
+    # One chi2_contingency / ttest_ind_from_stats call per pair and metric.
+    p_values = {"visit": [], "conversion": [], "spend": []}
+    for _, group in stats.groupby("level", sort=False):
+        rows = group.to_dict("records")
+        for a, b in itertools.combinations(rows, 2):
+            for metric in ("visit", "conversion"):
+                table = [[a[metric], a["n"] - a[metric]], [b[metric], b["n"] - b[metric]]]
+                p_values[metric].append(chi2_contingency(table)[1])
+            summary_a = summary_from_sums(a["spend_n"], a["spend"], a["spend_sq"])
+            summary_b = summary_from_sums(b["spend_n"], b["spend"], b["spend_sq"])
+            p_values["spend"].append(ttest_ind_from_stats(*summary_a, *summary_b)[1])
+    p_values = np.concatenate([p_values[metric] for metric in ("visit", "conversion", "spend")])
+    return adjust_pvalues(p_values, "holm")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--arms", type=int, default=30)
+    parser.add_argument("--levels", type=int, default=20)
+    args = parser.parse_args()
+
+    stats = synthetic_stats(args.arms, args.levels)
+    baseline, expected = timed(scipy_loop, stats)
+    elapsed, actual = timed(pairwise_tests, stats, ["level"], correction="holm")
+    # Both enumerate pairs level by level in segment order, so the rows line up.
+    assert np.allclose(expected, actual["p_adjusted"].to_numpy(), rtol=1e-6, atol=1e-12)
+    print(f"{args.arms} arms x {args.levels} levels: {len(actual):,} tests")
+    print(f"{'engine':<10} {'seconds':>8} {'speed-up':>8}")
+    print(f"{'scipy':<10} {baseline:>8.3f} {1.0:>8.2f}")
+    print(f"{'batched':<10} {elapsed:>8.3f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Aggregation speed-up vs. worker processes over shared-memory row shards.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel --rows 10000000 100000000
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregates import CampaignAggregates, parallel_aggregates
+from benchmarks.common import timed
+from benchmarks.synthetic import synthetic_frame
+
+# Counts must match exactly; float spend sums only up to summation order.
+EXACT_COLUMNS = ["n", "visit", "conversion", "spend_n"]
+
+
+def large_synthetic_frame(n_rows, chunk_rows=10_000_000):
+    # Generated in chunks so the int64 temporaries of synthetic_frame stay bounded.
+    frames = [
+        synthetic_frame(min(chunk_rows, n_rows - start), seed=start)
+        for start in range(0, n_rows, chunk_rows)
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def same_cells(expected, actual):
+    expected, actual = expected.cells.sort_index(), actual.cells.sort_index()
+    return (
+        len(expected) == len(actual)
+        and (expected[EXACT_COLUMNS].to_numpy() == actual[EXACT_COLUMNS].to_numpy()).all()
+        and np.allclose(expected[["spend", "spend_sq"]], actual[["spend", "spend_sq"]], rtol=1e-9)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000_000, 100_000_000])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    counts = []
+    workers = 2
+    while workers < args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(args.max_workers)
+
+    for n_rows in args.rows:
+        df = large_synthetic_frame(n_rows)
+        print(f"{n_rows:,} rows")
+        print(f"{'workers':>7} {'seconds':>8} {'speed-up':>8}")
+        baseline, expected = timed(CampaignAggregates.from_frame, df)
+        print(f"{1:>7} {baseline:>8.2f} {1.0:>8.2f}")
+        for n in counts:
+            if n <= 1:
+                continue
+            elapsed, actual = timed(parallel_aggregates, df, workers=n)
+            assert same_cells(expected, actual), f"{n} workers produced different aggregates"
+            print(f"{n:>7} {elapsed:>8.2f} {baseline / elapsed:>8.2f}")
+        del df
+
+
+if __name__ == "__main__":
+    main()
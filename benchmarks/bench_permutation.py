@@ -0,0 +1,70 @@
+"""Spend permutation tests: batched value-count draws vs. shuffling rows.
+
+Run from the repository root:
+    python -m benchmarks.bench_permutation --rows 10000000 --permutations 10000
+"""
+import argparse
+import os
+
+import numpy as np
+
+from bootstrap import spend_histograms
+from benchmarks.common import timed
+from benchmarks.synthetic import synthetic_frame
+from permutation import permutation_pvalues
+
+
+def row_permutations(spend_a, spend_b, permutations, seed=0):
+    # Two-sided p-value from shuffling the pooled rows, the reference permutation test.
+    rng = np.random.default_rng(seed)
+    pooled = np.concatenate([spend_a, spend_b])
+    observed = abs(spend_a.mean() - spend_b.mean())
+    hits = 0
+    for _ in range(permutations):
+        rng.shuffle(pooled)
+        hits += abs(pooled[:len(spend_a)].mean() - pooled[len(spend_a):].mean()) >= observed * (1 - 1e-9)
+    return (1 + hits) / (1 + permutations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--permutations", type=int, default=10_000)
+    parser.add_argument("--row-permutations", type=int, default=20, help="row-shuffling permutations to time")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    elapsed, histograms = timed(spend_histograms, df)
+    segments = sorted(histograms)
+    pairs = [(histograms[a], histograms[b]) for i, a in enumerate(segments) for b in segments[i + 1:]]
+    print(f"{args.rows:,} rows, {len(pairs)} segment pairs; spend histograms in {elapsed:.2f}s")
+
+    spend = {segment: group.dropna().to_numpy(np.float64)
+             for segment, group in df.groupby("campaign_segment", observed=True)["spend"]}
+    row_time, _ = timed(row_permutations, spend[segments[0]], spend[segments[1]], args.row_permutations)
+    per_permutation = row_time / args.row_permutations
+    print(f"row shuffling: {per_permutation:.3f}s per permutation and pair, "
+          f"~{per_permutation * args.permutations * len(pairs):,.0f}s for {args.permutations:,} x {len(pairs)}")
+
+    print(f"{'workers':>7} {'seconds':>8} {'speed-up':>8}")
+    baseline = expected = None
+    workers = 1
+    while True:
+        elapsed, (differences, p_values) = timed(permutation_pvalues, pairs, args.permutations, workers=workers)
+        if expected is None:
+            baseline, expected = elapsed, p_values
+        # Chunks are seeded independently of the worker count, so the p-values are identical.
+        assert np.array_equal(expected, p_values)
+        print(f"{workers:>7} {elapsed:>8.2f} {baseline / elapsed:>8.2f}")
+        if workers >= args.max_workers:
+            break
+        workers = min(workers * 2, args.max_workers)
+    for (a, b), difference, p in zip(
+        [(a, b) for i, a in enumerate(segments) for b in segments[i + 1:]], differences, expected
+    ):
+        print(f"{a} vs {b}: mean difference {difference:+.4f}, p = {p:.4f}")
+
+
+if __name__ == "__main__":
+    main()
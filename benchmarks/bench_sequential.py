@@ -0,0 +1,70 @@
+"""Sequential monitoring: O(1) updates per look vs. rescanning history, and the false-positive rate of peeking.
+
+Run from the repository root:
+    python -m benchmarks.bench_sequential --rows 10000000 --looks 50
+"""
+import argparse
+
+import numpy as np
+
+from aggregates import GROUP_KEYS, CampaignAggregates
+from benchmarks.common import timed
+from benchmarks.synthetic import synthetic_frame
+from data_loader import SEGMENT_ATTRIBUTES
+from sequential import mixture_variance, msprt_pvalues
+from significance import chi2_test
+
+
+def incremental_looks(deltas):
+    # Fold each delta into the cells, then advance the sequential state by one look.
+    aggregates, state = CampaignAggregates(GROUP_KEYS), None
+    for delta in deltas:
+        aggregates.update(delta)
+        state = aggregates.sequential_tests(SEGMENT_ATTRIBUTES, state)
+    return state
+
+
+def rescanned_looks(df, bounds):
+    # Re-aggregate every row seen so far and re-run the fixed-sample tests at each look.
+    for stop in bounds:
+        tests = CampaignAggregates.from_frame(df.iloc[:stop], GROUP_KEYS).pairwise_tests(SEGMENT_ATTRIBUTES)
+    return tests
+
+
+def peeking_false_positives(simulations, looks, batch, rate=0.1, alpha=0.05, seed=0):
+    # Share of A/A comparisons declared significant at some look, by chi-square vs. mSPRT p-values.
+    rng = np.random.default_rng(seed)
+    hits = rng.binomial(batch, rate, (2, simulations, looks)).cumsum(axis=-1)
+    n = np.broadcast_to(batch * np.arange(1, looks + 1), hits.shape)
+    _, naive = chi2_test(np.moveaxis(hits, 0, -1), np.moveaxis(n, 0, -1))
+    means = hits / n
+    variances = means * (1 - means)
+    # tau^2 is fixed from the first look, as sequential_tests stores it
+    tau_sq = mixture_variance(variances[..., :1].mean(axis=0))
+    always_valid = msprt_pvalues(means[0] - means[1], (variances / n).sum(axis=0), tau_sq)
+    return (naive.min(axis=-1) < alpha).mean(), (always_valid.min(axis=-1) < alpha).mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--looks", type=int, default=50)
+    parser.add_argument("--simulations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    bounds = np.linspace(0, args.rows, args.looks + 1).astype(int)[1:]
+    deltas = [df.iloc[start:stop] for start, stop in zip(np.r_[0, bounds[:-1]], bounds)]
+    incremental, state = timed(incremental_looks, deltas)
+    rescan, _ = timed(rescanned_looks, df, bounds)
+    print(f"{args.rows:,} rows over {args.looks} looks, {len(state)} monitored comparisons")
+    print(f"{'engine':<12} {'seconds':>8} {'speed-up':>8}")
+    print(f"{'rescan':<12} {rescan:>8.2f} {1.0:>8.2f}")
+    print(f"{'incremental':<12} {incremental:>8.2f} {rescan / incremental:>8.2f}")
+
+    naive, always_valid = peeking_false_positives(args.simulations, args.looks, max(1, args.rows // args.looks // 3))
+    print(f"A/A false positives when checking every look: chi-square {naive:.1%}, mSPRT {always_valid:.1%}")
+
+
+if __name__ == "__main__":
+    main()
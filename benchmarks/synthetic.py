@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import SCHEMA
+
+# Synthetic campaign rows with the digital_marketing_dataset.csv schema and
+# roughly its marginal distributions, for benchmarks at production volumes.
+SEGMENTS = ["Apparel E-Mail", "Footwear E-Mail", "No E-Mail"]
+ADDRESS_CATEGORIES = ["Rural", "Surburban", "Urban"]
+CHANNELS = ["Other", "Phone", "Web"]
+
+
+def synthetic_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    segment = rng.integers(0, 3, n_rows)
+    visit = rng.random(n_rows) < np.array([0.18, 0.15, 0.11])[segment]
+    conversion = visit & (rng.random(n_rows) < 0.06)
+    spend = np.where(conversion, np.round(rng.gamma(2.0, 60.0, n_rows), 2), 0.0)
+    df = pd.DataFrame({
+        "months_since_last_purchase": rng.integers(1, 13, n_rows),
+        "history_spend": np.round(29.99 + rng.exponential(210.0, n_rows), 2),
+        "history_footwear": rng.integers(0, 2, n_rows),
+        "history_apparel": rng.integers(0, 2, n_rows),
+        "address_category": pd.Categorical.from_codes(rng.choice(3, n_rows, p=[0.15, 0.45, 0.40]), ADDRESS_CATEGORIES),
+        "acquired_in_last_year": rng.integers(0, 2, n_rows),
+        "channel": pd.Categorical.from_codes(rng.choice(3, n_rows, p=[0.12, 0.44, 0.44]), CHANNELS),
+        "campaign_segment": pd.Categorical.from_codes(segment, SEGMENTS),
+        "visit": visit.astype(int),
+        "conversion": conversion.astype(int),
+        "spend": spend,
+    })
+    return df.astype(SCHEMA)
+
+
+def write_synthetic_csv(path, n_rows, chunk_rows=1_000_000, seed=0):
+    """Write n_rows synthetic rows to path in bounded memory; reuses an existing file of the same name."""
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".tmp"
+    written = 0
+    while written < n_rows:
+        rows = min(chunk_rows, n_rows - written)
+        synthetic_frame(rows, seed + written).to_csv(tmp_path, mode="a", header=written == 0, index=False)
+        written += rows
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import GROUP_KEYS, encode_keys
+
+# Row bitmaps for every value of the low-cardinality columns, built once per
+# dataset. Each bitmap is packed to one bit per row (8M rows -> 1 MB), so a
+# filter such as channel in {Web, Phone} AND address_category = Rural is a few
+# byte-wise ORs and ANDs instead of string comparisons over the full columns.
+# Selected rows come back as positions, which CampaignAggregates.from_frame
+# (rows=...) aggregates without copying out a filtered frame.
+INDEX_COLUMNS = GROUP_KEYS
+
+
+def intersect(*bitmaps):
+    """AND of packed bitmaps."""
+    return np.bitwise_and.reduce(bitmaps)
+
+
+def union(*bitmaps):
+    """OR of packed bitmaps."""
+    return np.bitwise_or.reduce(bitmaps)
+
+
+class BitmapIndex:
+    """Packed row bitmaps per (column, value)."""
+
+    def __init__(self, n_rows, bitmaps):
+        self.n_rows = n_rows
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def from_frame(cls, df, columns=INDEX_COLUMNS):
+        bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, (levels,) = encode_keys(df, [col])
+            # Missing values get no bitmap, so they never match a filter value.
+            bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(levels.tolist())
+                if not pd.isna(value)
+            }
+        return cls(len(df), bitmaps)
+
+    def values(self, column):
+        return list(self.bitmaps[column])
+
+    def bitmap(self, column, value):
+        """Rows where column == value; all zeros for a value that never occurs."""
+        if value in self.bitmaps[column]:
+            return self.bitmaps[column][value]
+        return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+
+    def everything(self):
+        return np.packbits(np.ones(self.n_rows, dtype=bool))
+
+    def select(self, filters=None):
+        """Bitmap of rows matching {column: [values]}: OR within a column, AND across columns.
+
+        Same filter layout as data_loader.read_campaign_dataset; None or an
+        empty mapping selects every row.
+        """
+        selected = self.everything()
+        for col, values in (filters or {}).items():
+            # An empty value list matches nothing (None never has a bitmap).
+            selected &= union(*[self.bitmap(col, value) for value in values or [None]])
+        return selected
+
+    def count(self, bitmap):
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(bitmap).sum(dtype=np.int64))
+        return int(np.unpackbits(bitmap, count=self.n_rows).sum(dtype=np.int64))
+
+    def mask(self, bitmap):
+        """Boolean row mask."""
+        return np.unpackbits(bitmap, count=self.n_rows).view(bool)
+
+    def rows(self, bitmap):
+        """Sorted row positions, for CampaignAggregates.from_frame(rows=...) or df.take."""
+        return np.flatnonzero(self.mask(bitmap))
@@ -0,0 +1,148 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metric_definitions import evaluate
+from quantile_sketch import QuantileSketch
+from significance import summary_from_sums
+
+# Bootstrap confidence intervals for the lift of one campaign_segment over another.
+# Replicates are drawn from aggregated counts instead of resampled rows:
+# - a segment's resampled conversion count is Binomial(n, conversions / n),
+#   exactly the count a row bootstrap of the 0/1 flag produces;
+# - its resampled spend is a Multinomial(n, counts / n) draw over the
+#   segment's distinct spend values (mostly 0, since spend is zero without a
+#   conversion), again exactly a row bootstrap, at O(distinct values) per
+#   replicate. Segments with more than MAX_SPEND_BINS distinct values are
+#   first merged into the log-spaced buckets of a QuantileSketch, keeping each
+#   bucket's count and exact mean: replicate means stay unbiased and only the
+#   spread within a bucket (about 2% of its values) is lost. Backends that
+#   keep only sums fall back to a normal draw of the mean around its standard
+#   error.
+# Replicates come in fixed-size batches, each seeded by its own SeedSequence
+# child, so the intervals depend on the seed only, not on how many worker
+# processes ran the batches.
+REPLICATES = 10_000
+CONFIDENCE = 0.95
+BATCH_SIZE = 1_000
+LIFT_METRICS = ["conversion_rate", "avg_spend"]
+MAX_SPEND_BINS = 1_000
+
+# Worker processes for the replicate batches (1 draws them in-process).
+BOOTSTRAP_WORKERS = int(os.environ.get("CAMPAIGN_BOOTSTRAP_WORKERS", 1))
+
+# Upper bound on replicates x distinct values held by one multinomial draw.
+_MAX_DRAW_CELLS = 4_000_000
+
+
+def histograms_from_counts(counts, by=()):
+    """Spend histograms from a frame of (by columns,) campaign_segment, spend, count rows.
+
+    Keyed by campaign_segment, or by (*by values, campaign_segment) when `by`
+    is given; each value is (distinct spend values, their counts).
+    """
+    by = list(by)
+    histograms = {}
+    for key, group in counts.groupby(by + ["campaign_segment"], sort=False, observed=True):
+        key = key if by else (key[0] if isinstance(key, tuple) else key)
+        histograms[key] = (group["spend"].to_numpy(np.float64), group["count"].to_numpy(np.int64))
+    return histograms
+
+
+def spend_histograms(df, by=()):
+    """Distinct non-missing spend values and their counts per campaign_segment of a frame (within each `by` group)."""
+    counts = df.groupby(list(by) + ["campaign_segment", "spend"], observed=True).size()
+    return histograms_from_counts(counts.rename("count").reset_index(), by)
+
+
+def coarsen_histogram(values, counts, max_bins=MAX_SPEND_BINS):
+    """A histogram with at most about max_bins values: sketch buckets, each represented by its exact mean."""
+    if len(values) <= max_bins:
+        return values, counts
+    _, bucket = np.unique(QuantileSketch().bucket(values), return_inverse=True)
+    bucket_counts = np.bincount(bucket, weights=counts)
+    bucket_sums = np.bincount(bucket, weights=counts * values)
+    return bucket_sums / bucket_counts, bucket_counts.astype(np.int64)
+
+
+def _draw_batch(seed, size, cells, histograms):
+    # Resampled (conversion rates, mean spends) of `size` replicates per segment.
+    # Separate streams, so the conversion draws do not depend on how spend is resampled.
+    conversion_rng, spend_rng = (np.random.default_rng(child) for child in seed.spawn(2))
+    draws = {}
+    for segment, cell in cells.items():
+        n = int(cell["n"])
+        rates = conversion_rng.binomial(n, cell["conversion"] / n, size) / n
+        if histograms and segment in histograms:
+            values, counts = histograms[segment]
+            spend_n = int(counts.sum())
+            step = max(1, _MAX_DRAW_CELLS // len(values))
+            means = np.concatenate([
+                spend_rng.multinomial(spend_n, counts / spend_n, min(step, size - start)) @ values / spend_n
+                for start in range(0, size, step)
+            ])
+        else:
+            mean, std, spend_n = summary_from_sums(cell["spend_n"], cell["spend"], cell["spend_sq"])
+            means = spend_rng.normal(mean, std / np.sqrt(spend_n), size)
+        draws[segment] = (rates, means)
+    return draws
+
+
+def bootstrap_draws(stats, histograms=None, replicates=REPLICATES, workers=None, seed=0):
+    """Replicate conversion rates and mean spends per campaign_segment.
+
+    `stats` holds the summed cell statistics per campaign_segment (as
+    CampaignAggregates.rollup returns them) and `histograms` optional exact
+    spend values from spend_histograms. Returns {segment: (rates, means)},
+    each an array of `replicates` draws.
+    """
+    workers = BOOTSTRAP_WORKERS if workers is None else workers
+    cells = {segment: row.to_dict() for segment, row in stats.iterrows()}
+    if histograms:
+        histograms = {segment: coarsen_histogram(*histogram) for segment, histogram in histograms.items()}
+    sizes = [min(BATCH_SIZE, replicates - start) for start in range(0, replicates, BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            batches = list(pool.map(
+                _draw_batch, seeds, sizes, [cells] * len(sizes), [histograms] * len(sizes)
+            ))
+    else:
+        batches = [_draw_batch(batch_seed, size, cells, histograms) for batch_seed, size in zip(seeds, sizes)]
+    return {
+        segment: tuple(np.concatenate([batch[segment][i] for batch in batches]) for i in range(2))
+        for segment in cells
+    }
+
+
+def lift_intervals(stats, histograms=None, replicates=REPLICATES, confidence=CONFIDENCE, workers=None, seed=0):
+    """Relative lift of segment_a over segment_b (a / b - 1) with bootstrap percentile intervals.
+
+    One row per segment pair (segment_a < segment_b) and LIFT_METRICS entry,
+    with the observed lift and the lower and upper bounds of the central
+    `confidence` interval of the replicate lifts.
+    """
+    draws = bootstrap_draws(stats, histograms, replicates, workers, seed)
+    segments = sorted(draws)
+    observed = evaluate(stats, LIFT_METRICS).loc[segments]
+    a, b = np.triu_indices(len(segments), k=1)
+    tails = [50 * (1 - confidence), 50 * (1 + confidence)]
+    frames = []
+    for i, metric in enumerate(LIFT_METRICS):
+        replicated = np.stack([draws[segment][i] for segment in segments])
+        values = observed[metric].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lifts = replicated[a] / replicated[b] - 1
+            lift = values[a] / values[b] - 1
+            lower, upper = np.nanpercentile(lifts, tails, axis=1) if len(a) else (lift, lift)
+        frames.append(pd.DataFrame({
+            "segment_a": np.asarray(segments, dtype=object)[a],
+            "segment_b": np.asarray(segments, dtype=object)[b],
+            "metric": metric,
+            "lift": lift,
+            "lower": lower,
+            "upper": upper,
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+
+from data_loader import SCHEMA, read_campaign_csv, read_campaign_csv_parallel, read_campaign_dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # The columnar cache is optional; without pyarrow every load parses the CSV.
+    pa = feather = None
+
+# Content-addressed columnar cache for parsed campaign datasets.
+# The first load of a file parses the CSV and writes an uncompressed Arrow IPC
+# copy named after the SHA-256 of the source bytes; later loads read that copy
+# instead of re-tokenising the text. The copy is opened as a memory map so a
+# projected read only pages in the requested columns, but converting them to
+# pandas copies them: a hit saves parse time, not memory. The directory is
+# capped in size and evicts least recently used entries (file mtime is touched
+# on every hit). A miss parses only the requested columns; an entry missing
+# some requested columns is rewritten with the union of its own and the new
+# ones, so it widens to what the callers of a dataset read, never beyond.
+CACHE_DIR = os.environ.get("CAMPAIGN_CACHE_DIR", os.path.join(".cache", "datasets"))
+CACHE_MAX_BYTES = int(os.environ.get("CAMPAIGN_CACHE_MAX_BYTES", 4 * 1024 ** 3))
+CACHE_SUFFIX = ".arrow"
+
+_BLOCK_SIZE = 1 << 20
+
+# Schema metadata key listing the columns an entry was parsed with; a source may
+# lack some of them, which must not count as a miss on every later read.
+_COLUMNS_KEY = b"campaign_columns"
+
+
+def content_hash(source):
+    """SHA-256 hex digest of a path or file-like object, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            for block in iter(lambda: fh.read(_BLOCK_SIZE), b""):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(_BLOCK_SIZE), b""):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def cached_read(source, columns=None, key=None, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Load a campaign dataset, going through the columnar cache when pyarrow is available."""
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        # Partitioned directories are read file by file; their Parquet parts are already columnar.
+        return read_campaign_dataset(source, columns=columns)
+    if feather is None:
+        return read_campaign_csv(source, columns=columns)
+
+    key = key or content_hash(source)
+    path = os.path.join(cache_dir, key + CACHE_SUFFIX)
+    wanted = list(SCHEMA) if columns is None else list(dict.fromkeys(col for col in columns if col in SCHEMA))
+    cached = []
+    try:
+        os.utime(path)
+        table = feather.read_table(path, memory_map=True)
+    except FileNotFoundError:
+        # Not cached yet, or evicted by another session since; parse the source again.
+        pass
+    else:
+        metadata = table.schema.metadata or {}
+        cached = json.loads(metadata[_COLUMNS_KEY]) if _COLUMNS_KEY in metadata else table.column_names
+        if set(wanted) <= set(cached):
+            return table.select([col for col in wanted if col in table.column_names]).to_pandas()
+
+    parse_columns = [col for col in SCHEMA if col in set(wanted) | set(cached)]
+    if isinstance(source, (str, os.PathLike)):
+        df = read_campaign_csv_parallel(source, columns=parse_columns)
+    else:
+        df = read_campaign_csv(source, columns=parse_columns)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write under a private name and rename so concurrent readers never see a partial file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, _COLUMNS_KEY: json.dumps(parse_columns).encode()})
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_bytes)
+    return df[[col for col in wanted if col in df.columns]]
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, suffix=CACHE_SUFFIX):
+    """Delete least recently used entries ending in `suffix` until the directory fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        # Dot-files are in-flight writes from other sessions.
+        if name.endswith(suffix) and not name.startswith("."):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    # The newest entry is always kept, even if it alone exceeds the cap.
+    for _, size, name in entries[:-1]:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,397 @@
+import gzip
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet partitions and the Arrow CSV reader need pyarrow; plain CSV does not.
+    pa = pa_csv = pq = None
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst extracts.
+    zstandard = None
+
+# Declared schema for the digital_marketing_dataset.csv layout.
+# Low-cardinality labels parse straight into categoricals, the 0/1 flags into
+# UInt8 and the money columns into float32, which keeps large uploads small in
+# memory and lets groupby work on integer category codes instead of strings.
+# The integer columns are pandas' nullable types, so an empty field loads as
+# <NA> (and shows up under Missing Values) instead of failing the parse.
+CATEGORICAL_COLUMNS = ["address_category", "channel", "campaign_segment"]
+FLAG_COLUMNS = [
+    "history_footwear",
+    "history_apparel",
+    "acquired_in_last_year",
+    "visit",
+    "conversion",
+]
+
+SCHEMA = {
+    "months_since_last_purchase": "UInt16",
+    "history_spend": "float32",
+    "history_footwear": "UInt8",
+    "history_apparel": "UInt8",
+    "address_category": "category",
+    "acquired_in_last_year": "UInt8",
+    "channel": "category",
+    "campaign_segment": "category",
+    "visit": "UInt8",
+    "conversion": "UInt8",
+    "spend": "float32",
+}
+
+# Attributes offered in the Segmentation Deep Dive tab, alone or crossed in pairs.
+SEGMENT_ATTRIBUTES = ["acquired_in_last_year", "address_category", "history_footwear", "history_apparel", "channel"]
+
+# Columns each dashboard tab reads. Loaders only parse the union of the tabs a
+# caller needs, so unused columns (and any extra columns carried by wide
+# exports) are skipped by the tokenizer instead of being materialised.
+# Data Overview summarises whatever frame the other tabs loaded and streams its
+# full-width sample rows from the head of the file, so on its own it needs only
+# the core columns. Together the tabs skip months_since_last_purchase.
+CORE_COLUMNS = ["campaign_segment", "visit", "conversion", "spend"]
+TAB_COLUMNS = {
+    "Executive Summary": CORE_COLUMNS,
+    "Data Overview": CORE_COLUMNS,
+    "Campaign Performance": CORE_COLUMNS,
+    "Statistical Tests": CORE_COLUMNS + SEGMENT_ATTRIBUTES,
+    "Segmentation Deep Dive": ["campaign_segment", "conversion", "spend"] + SEGMENT_ATTRIBUTES,
+    "Spend Profile": ["campaign_segment", "conversion", "history_spend"],
+}
+
+
+def columns_for(*tabs):
+    """Union of the columns used by the given tabs, in schema order."""
+    wanted = set()
+    for tab in tabs:
+        wanted.update(TAB_COLUMNS[tab])
+    return [col for col in SCHEMA if col in wanted]
+
+
+# Compressed extracts (.csv.gz, .csv.zst) are decompressed as a stream while
+# the tokenizer reads them, so the decompressed text is never held in memory.
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+
+def compression_for(source):
+    """Compression named by a path's (or file object's) extension, or None."""
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", None)
+    name = str(name or "").lower()
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def open_decompressed(path):
+    """Binary file object yielding the decompressed bytes of path."""
+    compression = compression_for(path)
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("Reading .zst files requires the zstandard package")
+        # The raw zstd reader has no readline(); buffer it like gzip.open does.
+        return io.BufferedReader(zstandard.open(path, "rb"))
+    return open(path, "rb")
+
+
+def read_campaign_csv(source, columns=None, **kwargs):
+    """Parse a campaign CSV (path or file-like, optionally .gz/.zst) into the declared dtypes.
+
+    When `columns` is given only those columns are parsed; names missing from
+    the file are ignored rather than raising.
+    """
+    if columns is not None:
+        wanted = set(columns)
+        kwargs["usecols"] = lambda col: col in wanted
+    kwargs.setdefault("compression", compression_for(source) or "infer")
+    return pd.read_csv(source, dtype=SCHEMA, **kwargs)
+
+
+# Hive-style partitioned datasets: a directory tree such as
+#   campaign_segment=Apparel E-Mail/channel=Web/part-0.csv
+# where each key=value directory fixes a column for every file below it.
+# Filters on partition keys prune whole files before they are opened.
+PARTITION_SUFFIXES = (".csv", ".csv.gz", ".csv.zst", ".parquet")
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+
+
+def discover_partitions(root):
+    """List (path, {partition key: value}) for every data file under a partitioned directory."""
+    partitions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        rel = os.path.relpath(dirpath, root)
+        values = {}
+        for part in ([] if rel == "." else rel.split(os.sep)):
+            if "=" in part:
+                key, value = part.split("=", 1)
+                value = unquote(value)
+                values[key] = None if value == HIVE_NULL else value
+        for name in sorted(filenames):
+            if name.lower().endswith(PARTITION_SUFFIXES) and not name.startswith((".", "_")):
+                partitions.append((os.path.join(dirpath, name), values))
+    return partitions
+
+
+def _partition_selected(values, filters):
+    # Directory names are strings; compare them in the column's type, as filter values are typed.
+    for key, allowed in filters.items():
+        if key in values and _cast_partition_value(key, values[key]) not in allowed:
+            return False
+    return True
+
+
+def _cast_partition_value(key, value):
+    if value is None or key not in SCHEMA or SCHEMA[key] == "category":
+        return value
+    return pd.Series([value]).astype(SCHEMA[key]).iloc[0]
+
+
+def _iter_partition_file(path, columns=None, chunksize=None):
+    # Yields the whole file at once unless chunksize is given.
+    if path.lower().endswith(".parquet"):
+        if pq is None:
+            raise ImportError("Reading Parquet partitions requires pyarrow")
+        parquet = pq.ParquetFile(path)
+        names = parquet.schema_arrow.names
+        if columns is not None:
+            names = [col for col in names if col in set(columns)]
+        if chunksize is None:
+            batches = [parquet.read(columns=names)]
+        else:
+            batches = parquet.iter_batches(batch_size=chunksize, columns=names)
+        for batch in batches:
+            frame = batch.to_pandas()
+            yield frame.astype({col: SCHEMA[col] for col in frame.columns if col in SCHEMA})
+    elif chunksize is None:
+        yield read_campaign_csv(path, columns=columns)
+    else:
+        with read_campaign_csv(path, columns=columns, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def _finish_partition_frame(frame, values, columns, filters):
+    for key, value in values.items():
+        if columns is None or key in columns:
+            frame[key] = _cast_partition_value(key, value)
+            if SCHEMA.get(key) == "category":
+                frame[key] = frame[key].astype("category")
+    for key, allowed in filters.items():
+        # Keys that are not partition keys are filtered row by row.
+        if key not in values and key in frame.columns:
+            frame = frame[frame[key].isin(allowed)]
+    return frame
+
+
+def _concat_frames(frames):
+    # Align category sets first so concat keeps categoricals instead of falling back to object.
+    categories = {
+        col: pd.api.types.union_categoricals([frame[col] for frame in frames], ignore_order=True).categories
+        for col in frames[0].columns
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype)
+    }
+    frames = [
+        frame.assign(**{col: frame[col].cat.set_categories(cats) for col, cats in categories.items()})
+        for frame in frames
+    ]
+    df = pd.concat(frames, ignore_index=True)
+    # Partition columns are appended per file; restore the schema column order.
+    ordered = [col for col in SCHEMA if col in df.columns]
+    return df[ordered + [col for col in df.columns if col not in SCHEMA]]
+
+
+def read_partitioned(root, columns=None, filters=None):
+    """Load a Hive-style partitioned directory of CSV/Parquet files.
+
+    `filters` maps column names to allowed values. Partitions whose key falls
+    outside a filter are never opened, e.g. an Apparel vs Footwear comparison
+    with filters={"campaign_segment": ["Apparel E-Mail", "Footwear E-Mail"]}
+    skips the No E-Mail directory entirely.
+    """
+    filters = filters or {}
+    frames = []
+    for path, values in discover_partitions(root):
+        if not _partition_selected(values, filters):
+            continue
+        for frame in _iter_partition_file(path, columns):
+            frames.append(_finish_partition_frame(frame, values, columns, filters))
+    if not frames:
+        return pd.DataFrame({col: pd.Series(dtype=SCHEMA[col]) for col in (columns or SCHEMA)})
+    return _concat_frames(frames)
+
+
+def read_campaign_dataset(source, columns=None, filters=None):
+    """Load a campaign CSV file or a partitioned dataset directory."""
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        return read_partitioned(source, columns=columns, filters=filters)
+    df = read_campaign_csv(source, columns=columns)
+    for key, allowed in (filters or {}).items():
+        df = df[df[key].isin(allowed)]
+    return df
+
+
+def iter_campaign_chunks(source, columns=None, chunksize=1_000_000, filters=None):
+    """Yield typed frames of at most ~chunksize rows from a CSV file or partitioned directory."""
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        filters = filters or {}
+        for path, values in discover_partitions(source):
+            if not _partition_selected(values, filters):
+                continue
+            for chunk in _iter_partition_file(path, columns, chunksize):
+                yield _finish_partition_frame(chunk, values, columns, filters)
+        return
+    with read_campaign_csv(source, columns=columns, chunksize=chunksize) as reader:
+        for chunk in reader:
+            for key, allowed in (filters or {}).items():
+                chunk = chunk[chunk[key].isin(allowed)]
+            yield chunk
+
+
+# Parallel ingest for large CSV files. The Arrow reader tokenises blocks on
+# every core of its thread pool; without pyarrow (or with engine="ranges") the
+# file is cut into byte ranges on line boundaries and each range is parsed in
+# its own process. Both produce the same typed frame as read_campaign_csv.
+# Range splitting assumes no quoted field contains a newline, which holds for
+# the campaign layout.
+_ARROW_TYPES = {
+    "UInt16": "uint16",
+    "UInt8": "uint8",
+    "float32": "float32",
+}
+
+
+def _header(path):
+    with open_decompressed(path) as fh:
+        header = fh.readline()
+    return header, pd.read_csv(io.BytesIO(header)).columns.tolist()
+
+
+def _read_arrow(path, columns, workers):
+    _, names = _header(path)
+    include = [col for col in names if columns is None or col in set(columns)]
+    column_types = {}
+    for col in include:
+        dtype = SCHEMA.get(col)
+        if dtype == "category":
+            column_types[col] = pa.dictionary(pa.int32(), pa.string())
+        elif dtype is not None:
+            column_types[col] = pa.type_for_alias(_ARROW_TYPES[dtype])
+    # Threading is chosen per call: Arrow's CPU pool is process-wide and shared by
+    # every session, so it is never resized here.
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(use_threads=workers is None or workers > 1),
+        # strings_can_be_null: an empty label is missing, as in pandas, not a "" category.
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types, include_columns=include, strings_can_be_null=True
+        ),
+    )
+    # Arrow's unsigned integers map to the nullable pandas dtypes of the schema.
+    df = table.to_pandas(types_mapper={pa.uint8(): pd.UInt8Dtype(), pa.uint16(): pd.UInt16Dtype()}.get)
+    # Arrow keeps categories in first-seen order; pandas sorts them.
+    for col in df.select_dtypes("category"):
+        df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+    return df
+
+
+def split_line_ranges(path, parts):
+    """Cut a CSV file (after its header) into up to `parts` byte ranges that end on newlines."""
+    header, _ = _header(path)
+    size = os.path.getsize(path)
+    start = len(header)
+    bounds = [start]
+    with open(path, "rb") as fh:
+        for i in range(1, parts):
+            target = max(start + (size - start) * i // parts, bounds[-1])
+            fh.seek(target)
+            fh.readline()
+            position = min(fh.tell(), size)
+            if position > bounds[-1]:
+                bounds.append(position)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_range(path, start, end, names, columns):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    return read_campaign_csv(io.BytesIO(data), columns=columns, header=None, names=names)
+
+
+def sample_csv_blocks(path, columns=None, n_blocks=1024, block_size=4 * 1024, seed=0):
+    """Rows from n_blocks randomly placed byte ranges of a plain CSV, and the file's estimated row count.
+
+    Each block is widened to whole lines, so the rows are a cluster sample
+    that costs a few seeks instead of a full parse. Files no larger than the
+    blocks are read whole and their rows dealt at random into n_blocks groups.
+    Returns (frame, estimated_rows, block), where block numbers the cluster of
+    each row.
+    """
+    header, names = _header(path)
+    size = os.path.getsize(path)
+    start = len(header)
+    rng = np.random.default_rng(seed)
+    if size - start <= n_blocks * block_size:
+        df = read_campaign_csv(path, columns=columns)
+        return df, len(df), rng.permutation(len(df)) % n_blocks
+    offsets = start + np.sort(rng.choice((size - start) // block_size, n_blocks, replace=False)) * block_size
+    blocks = []
+    with open(path, "rb") as fh:
+        for offset in offsets.tolist():
+            # Start at the first line beginning inside the block and finish the line it ends in.
+            fh.seek(offset - 1)
+            fh.readline()
+            begin = fh.tell()
+            blocks.append(fh.read(max(offset + block_size - begin, 0)) + fh.readline())
+    data = b"".join(blocks)
+    df = read_campaign_csv(io.BytesIO(data), columns=columns, header=None, names=names)
+    lines = [sum(1 for line in block.splitlines() if line.strip()) for block in blocks]
+    return df, int(round(len(df) * (size - start) / max(len(data), 1))), np.repeat(np.arange(n_blocks), lines)
+
+
+def _read_ranges(path, columns, workers):
+    workers = workers or os.cpu_count() or 1
+    _, names = _header(path)
+    ranges = split_line_ranges(path, workers)
+    if not ranges:
+        return read_campaign_csv(path, columns=columns)
+    if workers == 1 or len(ranges) == 1:
+        frames = [_parse_range(path, start, end, names, columns) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_parse_range, path, start, end, names, columns) for start, end in ranges]
+            frames = [future.result() for future in futures]
+    df = _concat_frames(frames)
+    return df[[col for col in names if col in df.columns]]
+
+
+def read_campaign_csv_parallel(path, columns=None, workers=None, engine="auto"):
+    """Parse a CSV file on several cores into the same typed frame as read_campaign_csv.
+
+    engine is "arrow" (multithreaded pyarrow reader), "ranges" (byte ranges
+    parsed in a process pool) or "auto" (arrow when pyarrow is installed).
+    workers defaults to every core. The Arrow reader runs on one thread for
+    workers=1 and on Arrow's shared CPU pool otherwise; only the range engine
+    honours an exact count in between. Compressed files cannot be split into
+    byte ranges; the Arrow reader decompresses them as a stream and parses
+    the decompressed blocks in parallel, otherwise they are read serially.
+    """
+    if engine == "auto":
+        engine = "arrow" if pa_csv is not None else "ranges"
+    if engine == "ranges" and compression_for(path):
+        return read_campaign_csv(path, columns=columns)
+    if engine == "arrow":
+        return _read_arrow(path, columns, workers)
+    return _read_ranges(path, columns, workers)
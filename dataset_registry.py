@@ -0,0 +1,126 @@
+import hashlib
+import os
+
+from data_cache import evict
+from data_loader import discover_partitions
+
+# Registry of datasets the dashboard has seen, addressed by a short id.
+# Uploads are spilled to UPLOAD_DIR once, hashing the bytes while they are
+# written, and local files are fingerprinted from their size, mtime and a few
+# sampled blocks. Cached loaders take the id string, so a rerun (theme toggle,
+# selectbox change) never re-hashes the dataset contents to find its entry.
+# Uploads are evicted least recently used first once UPLOAD_DIR outgrows its
+# cap; resolve() touches an upload's mtime, so datasets sessions keep reading
+# stay. An upload evicted anyway no longer resolves, and its session can
+# register the same bytes again (see is_available).
+UPLOAD_DIR = os.environ.get("CAMPAIGN_UPLOAD_DIR", os.path.join(".cache", "uploads"))
+UPLOAD_MAX_BYTES = int(os.environ.get("CAMPAIGN_UPLOAD_MAX_BYTES", 8 * 1024 ** 3))
+
+_BLOCK_SIZE = 1 << 20
+_SAMPLE_BLOCKS = 8
+_SAMPLE_SIZE = 64 * 1024
+
+_datasets = {}
+_fingerprints = {}
+
+
+class DatasetUnavailable(KeyError):
+    """A dataset id that is unknown, or whose file has been evicted or removed."""
+
+
+def _upload_suffix(name):
+    # Keep the extension chain (".csv", ".csv.gz") so readers can infer the format.
+    base = os.path.basename(name)
+    return base[base.index("."):].lower() if "." in base else ""
+
+
+def register_upload(fileobj, name):
+    """Spill an uploaded file to disk and return its id (SHA-256 of the bytes)."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    tmp_path = os.path.join(UPLOAD_DIR, f".upload.{os.getpid()}.{id(fileobj)}.tmp")
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    with open(tmp_path, "wb") as out:
+        for block in iter(lambda: fileobj.read(_BLOCK_SIZE), b""):
+            digest.update(block)
+            out.write(block)
+    fileobj.seek(0)
+
+    dataset_id = digest.hexdigest()
+    path = os.path.join(UPLOAD_DIR, dataset_id + _upload_suffix(name))
+    os.replace(tmp_path, path)
+    evict(UPLOAD_DIR, UPLOAD_MAX_BYTES, suffix="")
+    _datasets[dataset_id] = path
+    return dataset_id
+
+
+def _fingerprint_directory(root):
+    # Partitioned datasets: hash the relative path, size and mtime of every data file.
+    digest = hashlib.blake2b(digest_size=20)
+    for path, _ in discover_partitions(root):
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def fingerprint(path):
+    """Cheap content fingerprint: size, mtime and a hash of evenly spaced sample blocks."""
+    if os.path.isdir(path):
+        return _fingerprint_directory(path)
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _fingerprints:
+        return _fingerprints[memo_key]
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, "rb") as fh:
+        if stat.st_size <= _SAMPLE_BLOCKS * _SAMPLE_SIZE:
+            digest.update(fh.read())
+        else:
+            step = (stat.st_size - _SAMPLE_SIZE) // (_SAMPLE_BLOCKS - 1)
+            for i in range(_SAMPLE_BLOCKS):
+                fh.seek(i * step)
+                digest.update(fh.read(_SAMPLE_SIZE))
+    _fingerprints[memo_key] = digest.hexdigest()
+    return _fingerprints[memo_key]
+
+
+def register_path(path):
+    """Register a local dataset file or partitioned directory and return its fingerprint id."""
+    dataset_id = fingerprint(path)
+    _datasets[dataset_id] = path
+    return dataset_id
+
+
+def resolve(dataset_id):
+    """Local path of a registered dataset; DatasetUnavailable if it is unknown or its file is gone."""
+    path = _datasets.get(dataset_id)
+    if path is not None and not os.path.exists(path):
+        # Evicted (uploads) or removed since it was registered.
+        del _datasets[dataset_id]
+        path = None
+    # Uploads survive a process restart on disk even though the in-memory map does not.
+    if path is None and os.path.isdir(UPLOAD_DIR):
+        for name in os.listdir(UPLOAD_DIR):
+            if name.startswith(dataset_id):
+                path = _datasets[dataset_id] = os.path.join(UPLOAD_DIR, name)
+                break
+    if path is None:
+        raise DatasetUnavailable(f"Unknown dataset id: {dataset_id}")
+    if os.path.dirname(path) == UPLOAD_DIR:
+        try:
+            # Mark the upload as recently used for evict().
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def is_available(dataset_id):
+    """Whether a dataset still resolves to a file on disk (another session's uploads may have evicted it)."""
+    try:
+        resolve(dataset_id)
+    except DatasetUnavailable:
+        return False
+    return True
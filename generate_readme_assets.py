@@ -2,6 +2,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from aggregates import SPEND_TIERS, grouped_metrics, spend_tiers
+from data_loader import columns_for, read_campaign_csv_parallel
 
 # Set style
 sns.set_theme(style="whitegrid")
@@ -10,14 +12,21 @@ plt.rcParams['figure.figsize'] = (12, 6)
 def generate_assets():
     try:
         # Load data
-        df = pd.read_csv("digital_marketing_dataset.csv")
+        df = read_campaign_csv_parallel(
+            "digital_marketing_dataset.csv",
+            columns=columns_for("Campaign Performance", "Spend Profile"),
+        )
         
+        # Both charts come from one pass over the rows, keyed by campaign and spend tier
+        df['spend_group'] = spend_tiers(df['history_spend'])
+        metrics, spend_metrics = grouped_metrics(
+            df,
+            [["campaign_segment"], ["campaign_segment", "spend_group"]],
+            ["visit_rate", "conversion_rate", "avg_spend"],
+        )
+        spend_metrics['spend_group'] = pd.Categorical(spend_metrics['spend_group'], categories=SPEND_TIERS, ordered=True)
+
         # 1. Campaign Performance Overview
-        metrics = df.groupby("campaign_segment").agg(
-            visit_rate=("visit", "mean"),
-            conversion_rate=("conversion", "mean"),
-            avg_spend=("spend", "mean")
-        ).reset_index()
 
         # Create a subplot figure
         fig, axes = plt.subplots(1, 3, figsize=(18, 6))
@@ -39,12 +48,6 @@ def generate_assets():
         print("Generated campaign_performance.png")
 
         # 2. Conversion by Spend Group (Profiling)
-        # Dynamic binning
-        df['spend_group'] = pd.qcut(df['history_spend'], q=3, labels=['Low Value', 'Medium Value', 'High Value'])
-        spend_metrics = df.groupby(['campaign_segment', 'spend_group']).agg(
-            conversion_rate=('conversion', 'mean')
-        ).reset_index()
-
         plt.figure(figsize=(10, 6))
         sns.barplot(data=spend_metrics, x='spend_group', y='conversion_rate', hue='campaign_segment', palette='coolwarm')
         plt.title("Conversion Rate by Historical Spend Tier")
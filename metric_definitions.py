@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Every campaign metric is declared once, as one additive cell statistic (see
+# aggregates.STAT_COLUMNS) or a ratio of two. Because the statistics add up, a
+# metric for any grouping is read from cells rolled up to that grouping, and
+# the in-memory cube, streamed and sampled aggregates and the SQL backend all
+# compute the same numbers from the same declarations.
+#
+# name: (numerator, denominator); a denominator of None declares a count.
+METRICS = {
+    "user_count": ("n", None),
+    "visit_rate": ("visit", "n"),
+    "conversion_count": ("conversion", None),
+    "conversion_rate": ("conversion", "n"),
+    "avg_spend": ("spend", "spend_n"),
+    # Rows with a recorded spend, the denominator of avg_spend.
+    "spend_count": ("spend_n", None),
+}
+
+# Metrics shown per campaign, per campaign x segment, and for the whole selection.
+CAMPAIGN_METRICS = ["user_count", "visit_rate", "conversion_count", "conversion_rate", "avg_spend"]
+SEGMENT_METRICS = ["visit_rate", "conversion_rate", "avg_spend"]
+TOTAL_METRICS = ["user_count", "conversion_rate", "avg_spend"]
+
+
+def definition(name):
+    """(numerator, denominator) statistics of a declared metric."""
+    if name not in METRICS:
+        raise ValueError(f"Unknown metric: {name}")
+    return METRICS[name]
+
+
+def evaluate(cells, names=CAMPAIGN_METRICS):
+    """The named metrics for each row of `cells`, a frame of summed cell statistics.
+
+    Each metric is one vectorised column operation on the same frame, so
+    asking for several metrics costs no extra pass. The result keeps the
+    index of `cells`. Counts are rounded to integers (sampled aggregates
+    scale them by fractional weights); empty denominators give NaN.
+    """
+    out = pd.DataFrame(index=cells.index)
+    for name in names:
+        numerator, denominator = definition(name)
+        values = cells[numerator].to_numpy(dtype=np.float64)
+        if denominator is None:
+            out[name] = np.round(values).astype("int64")
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[name] = values / cells[denominator].to_numpy(dtype=np.float64)
+    return out
+
+
+def evaluate_totals(cells, names=TOTAL_METRICS):
+    """{metric: value} over all rows of `cells` summed together."""
+    totals = evaluate(cells.sum().to_frame().T, names)
+    return {name: totals[name].iloc[0] for name in names}
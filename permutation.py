@@ -0,0 +1,130 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bootstrap import coarsen_histogram
+from significance import adjust_tests
+
+# Permutation tests of the difference in mean spend between two segments.
+# Spend is zero for every non-converting user, so its distribution is a spike
+# at zero plus a long tail and the t-test's normal approximation is shaky.
+# A permutation test makes no such assumption: shuffling the segment labels of
+# the pooled rows and recomputing the difference gives its null distribution
+# without one. Only the spend values a shuffle assigns to segment A matter,
+# and over the pooled histogram of distinct values (see
+# bootstrap.spend_histograms) those counts are one multivariate hypergeometric
+# draw. A whole chunk of permutations is therefore a single
+# (permutations x distinct values) draw and one matrix product with the
+# values, at a cost independent of the number of rows. The test is exact (up
+# to Monte Carlo error) while the pooled histogram has at most PERMUTATION_BINS
+# distinct values. Continuous spend usually has more, and is then merged into
+# sketch buckets with their exact means (see bootstrap.coarsen_histogram): the
+# shuffles move whole buckets, so the null distribution and the p-values are
+# approximate, off by at most the spread within a bucket (about 2% of its
+# values). Chunks are seeded by their own
+# SeedSequence child, so the p-values depend on the seed only, not on how
+# many worker processes ran them.
+PERMUTATIONS = 10_000
+CHUNK_SIZE = 1_000
+
+# Distinct spend values permuted exactly; the draw cost grows with this, so it
+# is lower than the bootstrap's bootstrap.MAX_SPEND_BINS.
+PERMUTATION_BINS = 256
+
+# Worker processes for the permutation chunks (1 runs them in-process).
+PERMUTATION_WORKERS = int(os.environ.get("CAMPAIGN_PERMUTATION_WORKERS", 1))
+
+# Upper bound on permutations x distinct values held by one draw.
+_MAX_DRAW_CELLS = 4_000_000
+
+
+def pool_histograms(histogram_a, histogram_b):
+    """The combined histogram of two (values, counts) spend histograms."""
+    values, inverse = np.unique(np.concatenate([histogram_a[0], histogram_b[0]]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([histogram_a[1], histogram_b[1]]), minlength=len(values))
+    return values, counts.astype(np.int64)
+
+
+def _exceedances(seed, size, values, counts, n_a, observed):
+    # How many of `size` label permutations give a mean difference at least as extreme as observed.
+    rng = np.random.default_rng(seed)
+    n_b = counts.sum() - n_a
+    total = counts @ values
+    # Relative tolerance, so permutations that tie the observed split are not lost to rounding.
+    threshold = abs(observed) * (1 - 1e-9)
+    step = max(1, _MAX_DRAW_CELLS // len(values))
+    hits = 0
+    for start in range(0, size, step):
+        sums_a = rng.multivariate_hypergeometric(counts, n_a, min(step, size - start), method="marginals") @ values
+        hits += int(np.count_nonzero(np.abs(sums_a / n_a - (total - sums_a) / n_b) >= threshold))
+    return hits
+
+
+def permutation_pvalues(pairs, permutations=PERMUTATIONS, workers=None, seed=0):
+    """Two-sided permutation tests of the difference in mean spend, one per (histogram_a, histogram_b) pair.
+
+    Returns (mean_a - mean_b, p) arrays with p = (1 + extreme permutations) /
+    (1 + permutations); pairs with an empty side give NaN. Pairs with more than
+    PERMUTATION_BINS distinct spend values are permuted over sketch buckets,
+    so their p-values are approximate.
+    """
+    workers = PERMUTATION_WORKERS if workers is None else workers
+    differences = np.full(len(pairs), np.nan)
+    sizes = [min(CHUNK_SIZE, permutations - start) for start in range(0, permutations, CHUNK_SIZE)]
+    tasks = []
+    for i, (pair, pair_seed) in enumerate(zip(pairs, np.random.SeedSequence(seed).spawn(len(pairs)))):
+        histogram_a, histogram_b = pair
+        n_a, n_b = int(histogram_a[1].sum()), int(histogram_b[1].sum())
+        if not n_a or not n_b:
+            continue
+        differences[i] = histogram_a[1] @ histogram_a[0] / n_a - histogram_b[1] @ histogram_b[0] / n_b
+        values, counts = coarsen_histogram(*pool_histograms(histogram_a, histogram_b), PERMUTATION_BINS)
+        for chunk_seed, size in zip(pair_seed.spawn(len(sizes)), sizes):
+            tasks.append((i, (chunk_seed, size, values, counts, n_a, differences[i])))
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            hits = list(pool.map(_exceedances, *zip(*(args for _, args in tasks))))
+    else:
+        hits = [_exceedances(*args) for _, args in tasks]
+    extreme = np.bincount([i for i, _ in tasks], weights=hits, minlength=len(pairs))
+    p_values = np.where(np.isnan(differences), np.nan, (1 + extreme) / (1 + permutations))
+    return differences, p_values
+
+
+def permutation_tests(tests, histograms, by=(), permutations=PERMUTATIONS, correction="holm", alpha=0.05,
+                      workers=None, seed=0):
+    """significance.pairwise_tests() output with its spend rows tested by permutation.
+
+    `histograms` maps (*by values, campaign_segment) to that cell's spend
+    histogram (see attribute_histograms). The spend statistic becomes the
+    difference in mean spend and the family is adjusted again.
+    """
+    by = list(by)
+    tests = tests.copy()
+    spend = np.flatnonzero((tests["metric"] == "spend").to_numpy())
+    empty = (np.empty(0), np.empty(0, dtype=np.int64))
+    pairs = [
+        tuple(histograms.get((*key, segment), empty) for segment in (segment_a, segment_b))
+        for *key, segment_a, segment_b in tests.iloc[spend][by + ["segment_a", "segment_b"]].itertuples(index=False)
+    ]
+    differences, p_values = permutation_pvalues(pairs, permutations, workers, seed)
+    tests.iloc[spend, tests.columns.get_loc("statistic")] = differences
+    tests.iloc[spend, tests.columns.get_loc("p_value")] = p_values
+    return adjust_tests(tests, correction, alpha)
+
+
+def attribute_histograms(histograms_for, attributes=()):
+    """Spend histograms keyed by (attribute, level, campaign_segment), the groups CampaignAggregates.pairwise_tests uses.
+
+    `histograms_for(by)` returns histograms keyed like
+    bootstrap.spend_histograms(df, by); the whole selection is keyed
+    ("All", "All", campaign_segment).
+    """
+    keyed = {("All", "All", segment): histogram for segment, histogram in histograms_for(()).items()}
+    for attribute in attributes:
+        keyed.update({
+            (attribute, level, segment): histogram
+            for (level, segment), histogram in histograms_for([attribute]).items()
+        })
+    return keyed
@@ -0,0 +1,87 @@
+import numpy as np
+
+# Mergeable quantile sketch with relative-error guarantees (the DDSketch layout).
+# Positive values are counted in log-spaced buckets: bucket i holds
+# (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), and reports the value
+# 2 * gamma^i / (gamma + 1), which is within a relative error `a` of anything
+# in the bucket. Bucket boundaries do not depend on the data, so sketches of
+# different shards, chunks or days merge by adding counts, exactly, and the
+# bucket index can be used as an ordinary aggregate key (see
+# CampaignAggregates.spend_tier_edges).
+#
+# Error bounds, for n values and relative accuracy a:
+# - quantile(q) returns a value within a * x of x, the order statistic of rank
+#   floor(q * (n - 1)). pd.qcut interpolates between that order statistic and
+#   the next one, so the gap between those two is added on top.
+# - Tier membership can only differ from qcut for rows in the bucket holding a
+#   cut point; those buckets span a relative width of 2a around each edge.
+# - Values at or below MIN_VALUE (including 0) share the lowest bucket.
+# Size is one count per occupied bucket: log(max / min) / log(gamma), about 235
+# buckets for history_spend between $30 and $3,300 at a = 1%.
+DEFAULT_RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 1e-2
+
+
+class QuantileSketch:
+    """Bucket counts of a value stream, with approximate quantiles."""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, counts=None):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.counts = {int(bucket): count for bucket, count in dict(counts or {}).items() if count}
+
+    def bucket(self, values):
+        """Bucket index of each value (float, NaN for NaN values)."""
+        values = np.asarray(values, dtype=np.float64)
+        return np.ceil(np.log(np.maximum(values, MIN_VALUE)) / self._log_gamma)
+
+    def value(self, buckets):
+        """Representative value of each bucket index."""
+        return 2 * np.power(self.gamma, np.asarray(buckets, dtype=np.float64)) / (self.gamma + 1)
+
+    def update(self, values):
+        buckets = self.bucket(values)
+        buckets, counts = np.unique(buckets[~np.isnan(buckets)].astype(np.int64), return_counts=True)
+        for bucket, count in zip(buckets.tolist(), counts.tolist()):
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        return self
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def merge(self, *others):
+        """New sketch holding the values of self and every other."""
+        counts = dict(self.counts)
+        for other in others:
+            if other.relative_accuracy != self.relative_accuracy:
+                raise ValueError("Cannot merge sketches with different relative accuracy")
+            for bucket, count in other.counts.items():
+                counts[bucket] = counts.get(bucket, 0) + count
+        return type(self)(self.relative_accuracy, counts)
+
+    def quantile_buckets(self, qs):
+        """Bucket holding the value of rank floor(q * (n - 1)) for each q."""
+        if not self.counts:
+            raise ValueError("Empty sketch")
+        buckets = np.array(sorted(self.counts))
+        cumulative = np.cumsum([self.counts[bucket] for bucket in buckets])
+        ranks = np.floor(np.asarray(qs, dtype=np.float64) * (cumulative[-1] - 1))
+        return buckets[np.searchsorted(cumulative, ranks, side="right")]
+
+    def quantiles(self, qs):
+        return self.value(self.quantile_buckets(qs))
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": list(self.counts),
+            "counts": list(self.counts.values()),
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        return cls(payload["relative_accuracy"], dict(zip(payload["buckets"], payload["counts"])))
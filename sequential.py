@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from significance import PAIRWISE_METRICS, adjust_tests, segment_pairs, summary_from_sums
+
+# Always-valid sequential tests for campaigns monitored while they run.
+# Re-running a fixed-sample test at every refresh and acting on the first
+# p < alpha inflates false positives far beyond alpha. The mixture sequential
+# probability ratio test (mSPRT) does not: with a normal mixture N(0, tau^2)
+# over the true difference between two segments, its likelihood ratio against
+# no difference, given the observed difference d and its variance V, is
+#     sqrt(V / (V + tau^2)) * exp(tau^2 * d^2 / (2 * V * (V + tau^2))),
+# and the running minimum of 1 / ratio over all looks is a p-value that stays
+# valid however often the data are checked and whenever monitoring stops.
+# The ratio needs only the counts, sums and sums of squares already kept per
+# cell (a 0/1 flag is its own square), so between looks each comparison
+# carries O(1) state: its running p-value, the number of looks and tau^2.
+# tau^2 is set from the pooled variance at the first look a comparison can be
+# tested and then held fixed: the running minimum is only valid for a mixture
+# chosen before the data it is applied to, not one re-fitted at every look.
+
+# tau as a share of the per-row standard deviation: the mixture favours
+# standardized effects of about this size.
+MIXTURE_EFFECT = 0.1
+
+# Per metric, the (count, sum, sum of squares) cell statistics it is tested on.
+SEQUENTIAL_SUMS = {
+    "visit": ("n", "visit", "visit"),
+    "conversion": ("n", "conversion", "conversion"),
+    "spend": ("spend_n", "spend", "spend_sq"),
+}
+
+# Columns identifying one monitored comparison besides the `by` columns.
+_COMPARISON = ["segment_a", "segment_b", "metric"]
+
+
+def mixture_variance(pooled_variance, mixture_effect=MIXTURE_EFFECT):
+    """tau^2 of the normal mixture, scaled by the per-row variance."""
+    return mixture_effect ** 2 * np.asarray(pooled_variance, dtype=np.float64)
+
+
+def msprt_pvalues(difference, variance, tau_sq):
+    """1 / mSPRT likelihood ratio (capped at 1) at a single look, elementwise.
+
+    `variance` is the variance of the observed `difference` and `tau_sq` the
+    mixture variance (see mixture_variance), fixed across looks.
+    """
+    difference, variance, tau_sq = (np.asarray(value, dtype=np.float64) for value in (difference, variance, tau_sq))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio = (0.5 * np.log(variance / (variance + tau_sq))
+                     + tau_sq * difference ** 2 / (2 * variance * (variance + tau_sq)))
+    return np.minimum(1.0, np.exp(-log_ratio))
+
+
+def sequential_tests(stats, by=(), state=None, mixture_effect=MIXTURE_EFFECT):
+    """Always-valid p-values of every campaign segment pair within each `by` group, after one more look.
+
+    `stats` is laid out as for significance.pairwise_tests and `state` is the
+    result of the previous look (None at the first). Returns one row per
+    group, pair and metric with the observed difference (a minus b), the
+    running p-value, the number of looks and the mixture variance tau_sq
+    fixed at the first look; it is the state for the next look. `by` values
+    are kept as strings so the state round-trips through JSON.
+    """
+    by = list(by)
+    pairs = segment_pairs(stats, by)
+    keys = pairs[by + ["campaign_segment_a", "campaign_segment_b"]].astype(str).rename(
+        columns={"campaign_segment_a": "segment_a", "campaign_segment_b": "segment_b"}
+    )
+    previous = None
+    if state is not None and len(state):
+        columns = ["p_value", "looks"] + (["tau_sq"] if "tau_sq" in state else [])
+        previous = state.astype({col: str for col in by}).set_index(by + _COMPARISON)[columns]
+    frames = []
+    for metric in PAIRWISE_METRICS:
+        n, total, total_sq = SEQUENTIAL_SUMS[metric]
+        mean_a, std_a, n_a = summary_from_sums(pairs[f"{n}_a"], pairs[f"{total}_a"], pairs[f"{total_sq}_a"])
+        mean_b, std_b, n_b = summary_from_sums(pairs[f"{n}_b"], pairs[f"{total}_b"], pairs[f"{total_sq}_b"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = std_a ** 2 / n_a + std_b ** 2 / n_b
+            pooled_variance = ((n_a - 1) * std_a ** 2 + (n_b - 1) * std_b ** 2) / (n_a + n_b - 2)
+        tests = keys.assign(metric=metric, difference=mean_a - mean_b,
+                            tau_sq=mixture_variance(pooled_variance, mixture_effect))
+        if previous is not None and "tau_sq" in previous:
+            # Keep tau^2 from the first look; comparisons without a usable one yet take this look's
+            fixed = tests.join(previous["tau_sq"], on=by + _COMPARISON, rsuffix="_previous")["tau_sq_previous"]
+            tests["tau_sq"] = fixed.where(fixed > 0, tests["tau_sq"])
+        frames.append(tests.assign(
+            p_value=msprt_pvalues(tests["difference"], variance, tests["tau_sq"]),
+            looks=1,
+        ))
+    tests = pd.concat(frames, ignore_index=True)[by + _COMPARISON + ["difference", "p_value", "looks", "tau_sq"]]
+    if previous is not None:
+        joined = tests.join(previous[["p_value", "looks"]], on=by + _COMPARISON, rsuffix="_previous")
+        # fmin skips NaN: a comparison that could not be tested yet keeps its earlier p-value
+        tests["p_value"] = np.fmin(tests["p_value"], joined["p_value_previous"])
+        tests["looks"] = joined["looks_previous"].fillna(0).astype(np.int64) + 1
+    return tests
+
+
+def sequential_signals(tests, correction="holm", alpha=0.05):
+    """sequential_tests() output adjusted across the family, with a Stop or Continue signal per comparison.
+
+    Stop means the difference is significant at `alpha` after correction;
+    since the p-values are always valid, acting on it at any look is safe.
+    """
+    tests = adjust_tests(tests, correction, alpha)
+    tests["signal"] = np.where(tests["significant"], "Stop", "Continue")
+    return tests
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, t
+
+# Significance tests computed from per-segment summary statistics.
+# The dashboard's aggregates keep counts, sums and sums of squares per cell
+# (see aggregates.STAT_COLUMNS), which is all a chi-square test of rates or a
+# two-sample t-test needs, so no test touches the rows. Every function takes
+# scalars or NumPy arrays and broadcasts, one test per element; cases scipy
+# would reject (an empty group, zero variance) give NaN instead of raising.
+
+
+def summary_from_sums(n, total, total_sq):
+    """(mean, sample standard deviation, n) from a count, sum and sum of squares."""
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.asarray(total, dtype=np.float64) / n
+        var = np.maximum(np.asarray(total_sq, dtype=np.float64) - n * mean ** 2, 0.0) / (n - 1)
+    return mean, np.sqrt(var), n
+
+
+def chi2_test(hits, n, correction=True):
+    """Chi-square test that every group has the same hit rate, like chi2_contingency.
+
+    `hits` and `n` hold the hit count and size of each group along the last
+    axis, i.e. the contingency table [[hits, n - hits], ...]; any leading
+    axes index independent tests. As in scipy, Yates' continuity correction
+    is applied to 2x2 tables when `correction` is set. Returns (statistic, p).
+    """
+    hits = np.asarray(hits, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    observed = np.stack([hits, n - hits], axis=-1)
+    rate = hits.sum(axis=-1, keepdims=True) / n.sum(axis=-1, keepdims=True)
+    expected = np.stack([n * rate, n * (1 - rate)], axis=-1)
+    dof = hits.shape[-1] - 1
+    if dof == 1 and correction:
+        diff = expected - observed
+        observed = observed + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = ((observed - expected) ** 2 / expected).sum(axis=(-2, -1))
+    return statistic, chi2.sf(statistic, dof)
+
+
+def ttest(mean_a, std_a, n_a, mean_b, std_b, n_b, equal_var=True):
+    """Two-sided two-sample t-test from summary statistics, like ttest_ind_from_stats.
+
+    equal_var=True is Student's test with a pooled variance; False is Welch's
+    test with the Welch-Satterthwaite degrees of freedom. Returns (statistic, p).
+    """
+    mean_a, std_a, n_a, mean_b, std_b, n_b = (
+        np.asarray(value, dtype=np.float64) for value in (mean_a, std_a, n_a, mean_b, std_b, n_b)
+    )
+    var_a, var_b = std_a ** 2, std_b ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if equal_var:
+            dof = n_a + n_b - 2
+            pooled = ((n_a - 1) * var_a + (n_b - 1) * var_b) / dof
+            denominator = np.sqrt(pooled * (1 / n_a + 1 / n_b))
+        else:
+            se_a, se_b = var_a / n_a, var_b / n_b
+            dof = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+            denominator = np.sqrt(se_a + se_b)
+        statistic = (mean_a - mean_b) / denominator
+    return statistic, 2 * t.sf(np.abs(statistic), dof)
+
+
+def ttest_from_sums(n_a, total_a, sq_a, n_b, total_b, sq_b, equal_var=True):
+    """ttest() from the count, sum and sum of squares of each sample."""
+    return ttest(*summary_from_sums(n_a, total_a, sq_a), *summary_from_sums(n_b, total_b, sq_b), equal_var=equal_var)
+
+
+# Multiple-testing corrections for adjust_pvalues: Holm controls the
+# family-wise error rate, Benjamini-Hochberg the false discovery rate.
+CORRECTIONS = ["holm", "bh", "none"]
+
+# Metrics compared by pairwise_tests: chi-square for the 0/1 flags, a t-test for spend.
+PAIRWISE_METRICS = ["visit", "conversion", "spend"]
+
+
+def adjust_pvalues(p_values, method="holm"):
+    """p-values adjusted for the number of tests in the family.
+
+    NaN p-values (comparisons that could not be tested) stay NaN and do not
+    count towards the family size.
+    """
+    if method not in CORRECTIONS:
+        raise ValueError(f"Unknown correction: {method}")
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = p_values.copy()
+    if method == "none":
+        return adjusted
+    valid = np.flatnonzero(~np.isnan(p_values))
+    order = valid[np.argsort(p_values[valid], kind="stable")]
+    m = len(order)
+    ranked = p_values[order]
+    if method == "holm":
+        ranked = np.maximum.accumulate((m - np.arange(m)) * ranked)
+    else:
+        ranked = np.minimum.accumulate((m / np.arange(1, m + 1) * ranked)[::-1])[::-1]
+    adjusted[order] = np.minimum(ranked, 1.0)
+    return adjusted
+
+
+def segment_pairs(stats, by=()):
+    """One row per pair of campaign segments within each `by` group, their columns suffixed _a and _b."""
+    by = list(by)
+    if by:
+        pairs = stats.merge(stats, on=by, suffixes=("_a", "_b"))
+    else:
+        pairs = stats.merge(stats, how="cross", suffixes=("_a", "_b"))
+    return pairs[pairs["campaign_segment_a"] < pairs["campaign_segment_b"]].reset_index(drop=True)
+
+
+def pairwise_tests(stats, by=(), equal_var=True, correction="holm", alpha=0.05):
+    """Every pair of campaign segments within each group of `by`, for each PAIRWISE_METRICS entry.
+
+    `stats` has the `by` columns, campaign_segment and the summed cell
+    statistics (n, visit, conversion, spend_n, spend, spend_sq), one row per
+    segment and group. The pairs come from one self-join and each kind of
+    test is a single batched call over all of them; the p-values of the whole
+    family are then adjusted together. Returns one row per group, pair and
+    metric with segment_a < segment_b.
+    """
+    by = list(by)
+    pairs = segment_pairs(stats, by)
+
+    def both(col):
+        return np.stack([pairs[f"{col}_a"].to_numpy(np.float64), pairs[f"{col}_b"].to_numpy(np.float64)], axis=-1)
+
+    results = {metric: chi2_test(both(metric), both("n")) for metric in ("visit", "conversion")}
+    results["spend"] = ttest_from_sums(
+        pairs["spend_n_a"], pairs["spend_a"], pairs["spend_sq_a"],
+        pairs["spend_n_b"], pairs["spend_b"], pairs["spend_sq_b"],
+        equal_var=equal_var,
+    )
+    keys = pairs[by + ["campaign_segment_a", "campaign_segment_b"]].rename(
+        columns={"campaign_segment_a": "segment_a", "campaign_segment_b": "segment_b"}
+    )
+    out = pd.concat([
+        keys.assign(metric=metric, statistic=results[metric][0], p_value=results[metric][1])
+        for metric in PAIRWISE_METRICS
+    ], ignore_index=True)
+    return adjust_tests(out, correction, alpha)
+
+
+def adjust_tests(tests, correction="holm", alpha=0.05):
+    """pairwise_tests() output with p_adjusted and significant recomputed over all of its p_value rows."""
+    tests = tests.copy()
+    tests["p_adjusted"] = adjust_pvalues(tests["p_value"], correction)
+    tests["significant"] = tests["p_adjusted"] < alpha
+    return tests
@@ -0,0 +1,264 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from aggregates import FILTER_COLUMNS, GROUP_KEYS, SPEND_TIERS, STAT_COLUMNS, CampaignAggregates
+from bootstrap import REPLICATES, histograms_from_counts
+from data_loader import SCHEMA, SEGMENT_ATTRIBUTES, iter_campaign_chunks
+from metric_definitions import CAMPAIGN_METRICS, SEGMENT_METRICS, definition
+from permutation import PERMUTATIONS
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional; SQLite ships with Python.
+    duckdb = None
+
+# Embedded SQL backend for the campaign metrics.
+# The dataset is loaded once into an on-disk DuckDB (or SQLite) file and every
+# dashboard table is answered by an aggregate query pushed down to the engine,
+# so the server never holds the raw rows in memory.
+SQL_DIR = os.environ.get("CAMPAIGN_SQL_DIR", os.path.join(".cache", "sql"))
+TABLE = "campaign"
+
+_DUCKDB_TYPES = {
+    "UInt16": "USMALLINT",
+    "UInt8": "UTINYINT",
+    "float32": "FLOAT",
+    "category": "VARCHAR",
+}
+_INGEST_CHUNKSIZE = 500_000
+
+# SQL aggregate for each cell statistic; metric columns are built from these
+# and the declarations in metric_definitions.
+_STAT_SQL = {
+    "n": "COUNT(*)",
+    "visit": "SUM(visit)",
+    "conversion": "SUM(conversion)",
+    "spend_n": "COUNT(spend)",
+    "spend": "SUM(CAST(spend AS DOUBLE))",
+    "spend_sq": "SUM(CAST(spend AS DOUBLE) * spend)",
+}
+
+
+def metric_columns(names):
+    """SELECT list computing the named metrics over each group."""
+    columns = []
+    for name in names:
+        numerator, denominator = definition(name)
+        if denominator is None:
+            columns.append(f"{_STAT_SQL[numerator]} AS {name}")
+        else:
+            columns.append(f"1.0 * {_STAT_SQL[numerator]} / NULLIF({_STAT_SQL[denominator]}, 0) AS {name}")
+    return ",\n                   ".join(columns)
+
+
+def default_engine():
+    return "duckdb" if duckdb is not None else "sqlite"
+
+
+class SqlBackend:
+    """Campaign metrics answered by aggregate queries over an embedded database file."""
+
+    def __init__(self, db_path, engine=None, filters=None):
+        self.db_path = db_path
+        self.engine = engine or default_engine()
+        self.filters = dict(filters or {})
+        for col in self.filters:
+            if col not in FILTER_COLUMNS:
+                raise ValueError(f"Unknown filter column: {col}")
+        self._aggregates = None
+
+    def filtered(self, filters):
+        """The same database with every query restricted to rows matching {column: [values]}."""
+        return type(self)(self.db_path, self.engine, filters)
+
+    @classmethod
+    def from_csv(cls, csv_path, db_path, engine=None):
+        """Open db_path, loading csv_path (a CSV or partitioned directory) into it first if needed."""
+        backend = cls(db_path, engine)
+        if not os.path.exists(db_path):
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            tmp_path = f"{db_path}.{os.getpid()}.tmp"
+            backend._ingest(csv_path, tmp_path)
+            os.replace(tmp_path, db_path)
+        return backend
+
+    def _ingest(self, csv_path, db_path):
+        if self.engine == "duckdb":
+            columns = ", ".join(
+                f'CAST("{col}" AS {_DUCKDB_TYPES[dtype]}) AS "{col}"' for col, dtype in SCHEMA.items()
+            )
+            with duckdb.connect(db_path) as con:
+                if not os.path.isdir(csv_path):
+                    con.execute(
+                        f"CREATE TABLE {TABLE} AS SELECT {columns} FROM read_csv_auto(?, header = true)",
+                        [csv_path],
+                    )
+                    return
+                # Partitioned directories are appended chunk by chunk through a registered view.
+                for i, chunk in enumerate(iter_campaign_chunks(csv_path, list(SCHEMA), _INGEST_CHUNKSIZE)):
+                    con.register("chunk", chunk.astype({col: object for col in chunk.select_dtypes("category")}))
+                    if i == 0:
+                        con.execute(f"CREATE TABLE {TABLE} AS SELECT {columns} FROM chunk")
+                    else:
+                        con.execute(f"INSERT INTO {TABLE} SELECT {columns} FROM chunk")
+                    con.unregister("chunk")
+        else:
+            with sqlite3.connect(db_path) as con:
+                for chunk in iter_campaign_chunks(csv_path, list(SCHEMA), _INGEST_CHUNKSIZE):
+                    chunk.to_sql(TABLE, con, if_exists="append", index=False)
+
+    def _where(self, *conditions):
+        """WHERE clause joining `conditions` with the backend's filters, and the filter parameters."""
+        conditions = list(conditions)
+        params = []
+        for col, values in self.filters.items():
+            if values:
+                conditions.append(f"{col} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                conditions.append("1 = 0")
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def query(self, sql, params=()):
+        if self.engine == "duckdb":
+            with duckdb.connect(self.db_path, read_only=True) as con:
+                return con.execute(sql, list(params)).df()
+        with sqlite3.connect(self.db_path) as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+    @property
+    def n_rows(self):
+        where, params = self._where()
+        return int(self.query(f"SELECT COUNT(*) AS n FROM {TABLE} {where}", params)["n"].iloc[0])
+
+    def metrics(self):
+        where, params = self._where("campaign_segment IS NOT NULL")
+        return self.query(f"""
+            SELECT campaign_segment,
+                   {metric_columns(CAMPAIGN_METRICS)}
+            FROM {TABLE}
+            {where}
+            GROUP BY campaign_segment
+            ORDER BY campaign_segment
+        """, params)
+
+    def segment_metrics(self, *segment_cols):
+        for segment_col in segment_cols:
+            if segment_col not in SEGMENT_ATTRIBUTES:
+                raise ValueError(f"Unknown segment attribute: {segment_col}")
+        keys = ", ".join(["campaign_segment", *segment_cols])
+        where, params = self._where("campaign_segment IS NOT NULL", *[f"{col} IS NOT NULL" for col in segment_cols])
+        return self.query(f"""
+            SELECT {keys},
+                   {metric_columns(SEGMENT_METRICS)}
+            FROM {TABLE}
+            {where}
+            GROUP BY {keys}
+            ORDER BY {keys}
+        """, params)
+
+    def spend_tier_edges(self):
+        """history_spend tercile cut points, interpolated the same way as pd.qcut."""
+        if self.engine == "duckdb":
+            where, params = self._where()
+            edges = self.query(f"""
+                SELECT quantile_cont(CAST(history_spend AS DOUBLE), 1 / 3) AS low,
+                       quantile_cont(CAST(history_spend AS DOUBLE), 2 / 3) AS high
+                FROM {TABLE}
+                {where}
+            """, params).iloc[0]
+            return [float(edges["low"]), float(edges["high"])]
+
+        # SQLite has no percentile function: fetch the two order statistics around each cut.
+        where, params = self._where("history_spend IS NOT NULL")
+        n = int(self.query(f"SELECT COUNT(*) AS n FROM {TABLE} {where}", params)["n"].iloc[0])
+        edges = []
+        for q in (1 / 3, 2 / 3):
+            position = (n - 1) * q
+            lower = int(position)
+            values = self.query(
+                f"SELECT history_spend FROM {TABLE} {where} ORDER BY history_spend LIMIT 2 OFFSET ?",
+                params + [lower],
+            )["history_spend"].to_numpy()
+            upper = values[1] if len(values) > 1 else values[0]
+            edges.append(float(values[0] + (position - lower) * (upper - values[0])))
+        return edges
+
+    def spend_profile(self):
+        """Conversion rate per campaign_segment x history_spend tercile."""
+        low, high = self.spend_tier_edges()
+        where, params = self._where("campaign_segment IS NOT NULL", "history_spend IS NOT NULL")
+        profile = self.query(f"""
+            SELECT campaign_segment,
+                   CASE WHEN history_spend <= ? THEN '{SPEND_TIERS[0]}'
+                        WHEN history_spend <= ? THEN '{SPEND_TIERS[1]}'
+                        ELSE '{SPEND_TIERS[2]}' END AS spend_group,
+                   {metric_columns(["conversion_rate"])}
+            FROM {TABLE}
+            {where}
+            GROUP BY 1, 2
+        """, [low, high] + params)
+        profile["spend_group"] = pd.Categorical(profile["spend_group"], categories=SPEND_TIERS, ordered=True)
+        return profile.sort_values(["campaign_segment", "spend_group"]).reset_index(drop=True)
+
+    def aggregates(self):
+        """Pushed-down cell statistics, for the tests and summaries built on CampaignAggregates."""
+        # The database is never modified after ingest, so one query serves the whole session.
+        if self._aggregates is not None:
+            return self._aggregates
+        keys = ", ".join(GROUP_KEYS)
+        stats = ", ".join(f"{_STAT_SQL[col]} AS {col}" for col in STAT_COLUMNS)
+        where, params = self._where("campaign_segment IS NOT NULL")
+        cells = self.query(f"""
+            SELECT {keys},
+                   {stats}
+            FROM {TABLE}
+            {where}
+            GROUP BY {keys}
+        """, params)
+        cells = cells.set_index(GROUP_KEYS)[STAT_COLUMNS].astype("float64")
+        self._aggregates = CampaignAggregates(GROUP_KEYS, cells)
+        return self._aggregates
+
+    def key_values(self, key):
+        return self.aggregates().key_values(key)
+
+    def totals(self):
+        return self.aggregates().totals()
+
+    def describe(self):
+        return self.aggregates().describe()
+
+    def contingency(self, segment_a, segment_b, metric="visit"):
+        return self.aggregates().contingency(segment_a, segment_b, metric)
+
+    def spend_summary(self, segment):
+        return self.aggregates().spend_summary(segment)
+
+    def pairwise_tests(self, attributes=(), equal_var=True, correction="holm", spend_histograms=None,
+                       permutations=PERMUTATIONS, workers=None):
+        return self.aggregates().pairwise_tests(
+            attributes, equal_var, correction, spend_histograms, permutations, workers
+        )
+
+    def spend_histograms(self, by=()):
+        """Distinct spend values and their counts per campaign_segment (within each `by` group), for the bootstrap."""
+        by = list(by)
+        where, params = self._where(
+            *(f"{col} IS NOT NULL" for col in by), "campaign_segment IS NOT NULL", "spend IS NOT NULL"
+        )
+        columns = ", ".join(by + ["campaign_segment", "spend"])
+        return histograms_from_counts(self.query(f"""
+            SELECT {columns}, COUNT(*) AS count
+            FROM {TABLE}
+            {where}
+            GROUP BY {columns}
+            ORDER BY {columns}
+        """, params), by)
+
+    def lift_intervals(self, histograms=None, replicates=REPLICATES, workers=None, seed=0):
+        if histograms is None:
+            histograms = self.spend_histograms()
+        return self.aggregates().lift_intervals(histograms, replicates, workers, seed)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules live at the repository root, next to app.py.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import read_campaign_csv  # noqa: E402
+
+SAMPLE_CSV = os.path.join(ROOT, "digital_marketing_dataset.csv")
+
+
+@pytest.fixture(scope="session")
+def campaign_df():
+    """The bundled sample dataset, parsed with the declared schema."""
+    return read_campaign_csv(SAMPLE_CSV)
+
+
+@pytest.fixture(scope="session")
+def missing_csv(tmp_path_factory):
+    """The sample dataset with a few empty fields in every column."""
+    df = pd.read_csv(SAMPLE_CSV, dtype=str)
+    rng = np.random.default_rng(0)
+    for col in df.columns:
+        df.loc[rng.choice(len(df), 5, replace=False), col] = None
+    path = tmp_path_factory.mktemp("missing") / "campaign.csv"
+    df.to_csv(path, index=False)
+    return str(path)
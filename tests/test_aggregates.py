@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import (
+    GROUP_KEYS, SPEND_TIERS, CampaignAggregates, build_cube, cell_statistics, merge_aggregates, spend_tiers
+)
+from data_loader import read_campaign_csv
+
+
+def test_spend_tiers_match_qcut(campaign_df):
+    expected = pd.qcut(campaign_df["history_spend"], q=3, labels=SPEND_TIERS)
+    assert spend_tiers(campaign_df["history_spend"]).equals(expected)
+
+
+def test_spend_tiers_merge_tied_edges():
+    tiers = spend_tiers(pd.Series([1.0, 1.0, 2.0, np.nan]))
+    assert tiers.tolist()[:3] == ["Low Value", "Low Value", "Medium Value"]
+    assert pd.isna(tiers.iloc[3])
+
+
+def test_build_cube_on_tied_history_spend(campaign_df):
+    # A filtered selection whose history_spend values are all equal used to raise
+    # "Bin edges must be unique" from pd.qcut.
+    value = campaign_df["history_spend"].iloc[0]
+    rows = np.flatnonzero((campaign_df["history_spend"] == value).to_numpy())[:3]
+    cube = build_cube(campaign_df, rows=rows)
+    assert cube.n_rows == 3
+    profile = cube.spend_profile()
+    assert set(profile["spend_group"].astype(str)) == {"Low Value"}
+
+
+def test_cell_statistics_of_selected_rows(campaign_df):
+    rows = np.flatnonzero((campaign_df["channel"] == "Web").to_numpy())
+    selected = cell_statistics(campaign_df, GROUP_KEYS, rows)
+    expected = cell_statistics(campaign_df.iloc[rows], GROUP_KEYS)
+    pd.testing.assert_frame_equal(selected.sort_index(), expected.sort_index())
+
+
+def test_filtered_cube_matches_subset_upload(campaign_df):
+    rows = np.flatnonzero((campaign_df["address_category"] == "Urban").to_numpy())
+    cube = build_cube(campaign_df, rows=rows)
+    expected = build_cube(campaign_df.iloc[rows].reset_index(drop=True))
+    pd.testing.assert_frame_equal(cube.cells.sort_index(), expected.cells.sort_index())
+
+
+def normalised_cells(cells):
+    # Keys as strings (missing levels as "None", whichever dtype held them), in a fixed row order.
+    table = cells.reset_index()
+    keys = table[GROUP_KEYS].astype(object)
+    table[GROUP_KEYS] = keys.where(keys.notna(), None).astype(str)
+    return table.sort_values(GROUP_KEYS).reset_index(drop=True)
+
+
+def assert_same_cells(got, expected):
+    # Float sums agree up to summation order.
+    pd.testing.assert_frame_equal(normalised_cells(got), normalised_cells(expected), check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize("bounds", [[1], [10, 20_000], [5_000, 32_000, 63_999], list(range(6_400, 64_000, 6_400))])
+@pytest.mark.parametrize("with_missing", [False, True])
+def test_merged_shards_match_the_whole_frame(campaign_df, missing_csv, bounds, with_missing):
+    df = read_campaign_csv(missing_csv) if with_missing else campaign_df
+    whole = CampaignAggregates.from_frame(df, GROUP_KEYS)
+    shards = [
+        CampaignAggregates.from_bytes(CampaignAggregates.from_frame(df.iloc[start:stop], GROUP_KEYS).to_bytes())
+        for start, stop in zip([0] + bounds, bounds + [len(df)])
+    ]
+    merged = merge_aggregates(shards)
+    assert_same_cells(merged.cells, whole.cells)
+    assert_same_cells(CampaignAggregates.from_bytes(merged.to_bytes()).cells, whole.cells)
+    assert merged.n_rows == len(df)
+    assert merged.key_values("acquired_in_last_year") == [0, 1]
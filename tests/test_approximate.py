@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import build_cube
+from approximate import sample_cube
+from data_loader import sample_csv_blocks
+from tests.conftest import SAMPLE_CSV
+
+
+@pytest.fixture(scope="module")
+def sorted_csv(tmp_path_factory):
+    """The sample dataset twice over, sorted so that each block holds alike rows."""
+    df = pd.read_csv(SAMPLE_CSV)
+    path = tmp_path_factory.mktemp("sorted") / "campaign.csv"
+    pd.concat([df] * 2).sort_values(["campaign_segment", "history_spend"]).to_csv(path, index=False)
+    return str(path)
+
+
+def test_blocks_number_every_row(sorted_csv):
+    rows, estimated_rows, block = sample_csv_blocks(sorted_csv, n_blocks=256)
+    assert len(block) == len(rows) and block.min() >= 0 and block.max() < 256
+    assert np.all(np.diff(block) >= 0)
+    assert abs(estimated_rows / 128_000 - 1) < 0.05
+
+
+def test_intervals_cover_a_sorted_file(sorted_csv, campaign_df):
+    # Rows of one block are alike here, so intervals that assumed independent rows would miss most of the time.
+    exact = build_cube(campaign_df).metrics().set_index("campaign_segment")
+    covered = []
+    for seed in range(5):
+        cube = sample_cube(sorted_csv, seed=seed)
+        estimates = cube.metrics().set_index("campaign_segment")
+        half_widths = cube.intervals().set_index("campaign_segment")
+        for col in ("visit_rate", "conversion_rate", "avg_spend"):
+            covered.append(((estimates[col] - exact[col]).abs() <= half_widths[col]).to_numpy())
+    assert np.mean(covered) >= 0.8
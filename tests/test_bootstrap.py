@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import build_cube
+from bootstrap import bootstrap_draws, coarsen_histogram, spend_histograms
+
+
+@pytest.fixture(scope="module")
+def cube(campaign_df):
+    return build_cube(campaign_df)
+
+
+def test_intervals_do_not_depend_on_workers(campaign_df, cube):
+    histograms = spend_histograms(campaign_df)
+    single = cube.lift_intervals(histograms, replicates=3_000, workers=1)
+    parallel = cube.lift_intervals(histograms, replicates=3_000, workers=2)
+    pd.testing.assert_frame_equal(single, parallel)
+
+
+def test_intervals_contain_the_observed_lift(campaign_df, cube):
+    lifts = cube.lift_intervals(spend_histograms(campaign_df), replicates=2_000)
+    assert ((lifts["lower"] <= lifts["lift"]) & (lifts["lift"] <= lifts["upper"])).all()
+
+
+def test_replicates_spread_like_a_row_bootstrap(campaign_df, cube):
+    # The count-based draws are a row bootstrap, so their spread is the standard error of the mean.
+    draws = bootstrap_draws(cube.rollup(["campaign_segment"]), spend_histograms(campaign_df), replicates=4_000)
+    for segment, (rates, means) in draws.items():
+        rows = campaign_df[campaign_df["campaign_segment"] == segment]
+        for replicated, column in ((rates, "conversion"), (means, "spend")):
+            values = rows[column].to_numpy(np.float64)
+            assert replicated.mean() == pytest.approx(values.mean(), rel=0.02)
+            assert replicated.std() == pytest.approx(values.std() / np.sqrt(len(values)), rel=0.06)
+
+
+def test_sample_spend_is_resampled_without_coarsening(campaign_df):
+    for values, counts in spend_histograms(campaign_df).values():
+        coarse_values, coarse_counts = coarsen_histogram(values, counts)
+        assert coarse_values is values and coarse_counts is counts
+
+
+def test_coarsened_histogram_keeps_counts_and_sums():
+    rng = np.random.default_rng(0)
+    values = np.unique(rng.lognormal(4, 1, 5_000))
+    counts = rng.integers(1, 20, len(values))
+    coarse_values, coarse_counts = coarsen_histogram(values, counts, max_bins=100)
+    assert len(coarse_values) < len(values)
+    assert coarse_counts.sum() == counts.sum()
+    assert coarse_counts @ coarse_values == pytest.approx(counts @ values)
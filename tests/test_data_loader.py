@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import GROUP_KEYS, CampaignAggregates, encode_keys
+from data_loader import (
+    SCHEMA, iter_campaign_chunks, pa_csv, read_campaign_csv, read_campaign_csv_parallel, read_campaign_dataset
+)
+
+
+def test_empty_fields_load_as_missing(missing_csv):
+    df = read_campaign_csv(missing_csv)
+    assert (df.isna().sum() == 5).all()
+    assert {col: str(dtype) for col, dtype in df.dtypes.items()} == SCHEMA
+
+
+def test_missing_flags_get_their_own_level(missing_csv):
+    df = read_campaign_csv(missing_csv)
+    codes, (levels,) = encode_keys(df, ["acquired_in_last_year"])
+    assert levels.tolist()[:2] == [0, 1] and pd.isna(levels[2])
+    assert np.bincount(codes)[2] == 5
+    aggregates = CampaignAggregates.from_frame(df, GROUP_KEYS)
+    assert aggregates.n_rows == len(df)
+    assert aggregates.key_values("acquired_in_last_year") == [0, 1]
+    # Missing flags add nothing to the visit and conversion sums, as SUM() skips NULL.
+    assert aggregates.cells["visit"].sum() == df["visit"].sum()
+
+
+def test_partition_filters_compare_typed_values(campaign_df, tmp_path):
+    # Partition values come from directory names; filters carry typed values such as the 0/1 flags.
+    for (segment, acquired), group in campaign_df.groupby(["campaign_segment", "acquired_in_last_year"], observed=True):
+        directory = tmp_path / f"campaign_segment={segment}" / f"acquired_in_last_year={acquired}"
+        directory.mkdir(parents=True)
+        group.drop(columns=["campaign_segment", "acquired_in_last_year"]).to_csv(directory / "part-0.csv", index=False)
+    expected = int((campaign_df["acquired_in_last_year"] == 1).sum())
+    filters = {"acquired_in_last_year": [1]}
+    df = read_campaign_dataset(str(tmp_path), filters=filters)
+    assert len(df) == expected and (df["acquired_in_last_year"] == 1).all()
+    assert sum(len(chunk) for chunk in iter_campaign_chunks(str(tmp_path), filters=filters)) == expected
+
+
+@pytest.mark.parametrize("engine", ["arrow", "ranges"])
+def test_parallel_engines_match_read_campaign_csv(missing_csv, engine):
+    if engine == "arrow" and pa_csv is None:
+        pytest.skip("pyarrow is not installed")
+    expected = read_campaign_csv(missing_csv)
+    pd.testing.assert_frame_equal(read_campaign_csv_parallel(missing_csv, workers=2, engine=engine), expected)
+    columns = ["address_category", "campaign_segment", "visit"]
+    pd.testing.assert_frame_equal(
+        read_campaign_csv_parallel(missing_csv, columns=columns, workers=1, engine=engine), expected[columns]
+    )
@@ -0,0 +1,58 @@
+import itertools
+
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency, ttest_ind
+
+from aggregates import build_cube
+from significance import adjust_pvalues
+
+
+def reference_tests(df, attribute):
+    # One scipy call per group, pair and metric, in pairwise_tests' row order.
+    groups = [("All", df)] if attribute is None else [
+        (level, rows) for level, rows in df.groupby(attribute, observed=True)
+    ]
+    rows = {}
+    for level, group in groups:
+        for segment_a, segment_b in itertools.combinations(df["campaign_segment"].cat.categories, 2):
+            a = group[group["campaign_segment"] == segment_a]
+            b = group[group["campaign_segment"] == segment_b]
+            for metric in ("visit", "conversion"):
+                table = [[a[metric].sum(), len(a) - a[metric].sum()], [b[metric].sum(), len(b) - b[metric].sum()]]
+                rows[(str(level), segment_a, segment_b, metric)] = chi2_contingency(table)[1]
+            rows[(str(level), segment_a, segment_b, "spend")] = ttest_ind(a["spend"].to_numpy(np.float64), b["spend"].to_numpy(np.float64)).pvalue
+    return rows
+
+
+@pytest.mark.parametrize("attribute", [None, "channel", "address_category"])
+def test_pairwise_tests_match_scipy(campaign_df, attribute):
+    tests = build_cube(campaign_df).pairwise_tests([] if attribute is None else [attribute], correction="none")
+    expected = reference_tests(campaign_df, attribute)
+    tests = tests[tests["attribute"] == ("All" if attribute is None else attribute)]
+    assert len(tests) == len(expected)
+    columns = ["level", "segment_a", "segment_b", "metric", "p_value"]
+    for level, segment_a, segment_b, metric, p in tests[columns].itertuples(index=False):
+        assert p == pytest.approx(expected[(str(level), segment_a, segment_b, metric)], rel=1e-6)
+
+
+def test_holm_and_bh_match_their_definitions():
+    p = np.array([0.01, 0.04, np.nan, 0.03, 0.2, 0.005])
+    valid = p[~np.isnan(p)]
+    order = np.argsort(valid)
+    m = len(valid)
+    holm = np.empty(m)
+    holm[order] = np.minimum(np.maximum.accumulate((m - np.arange(m)) * valid[order]), 1)
+    bh = np.empty(m)
+    bh[order] = np.minimum(np.minimum.accumulate((valid[order] * m / np.arange(1, m + 1))[::-1])[::-1], 1)
+    np.testing.assert_allclose(adjust_pvalues(p, "holm")[~np.isnan(p)], holm)
+    np.testing.assert_allclose(adjust_pvalues(p, "bh")[~np.isnan(p)], bh)
+    assert np.isnan(adjust_pvalues(p, "holm")[2])
+    # Hand-checked values: Holm multiplies the k-th smallest by m - k + 1, BH by m / k.
+    np.testing.assert_allclose(adjust_pvalues([0.01, 0.02, 0.03], "holm"), [0.03, 0.04, 0.04])
+    np.testing.assert_allclose(adjust_pvalues([0.01, 0.02, 0.03], "bh"), [0.03, 0.03, 0.03])
+
+
+def test_unknown_correction_raises():
+    with pytest.raises(ValueError):
+        adjust_pvalues([0.01], "bonferroni")
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import build_cube
+from bootstrap import spend_histograms
+from permutation import attribute_histograms, permutation_pvalues
+
+PERMUTATIONS = 2_000
+
+
+def row_shuffle_pvalue(spend_a, spend_b, permutations, seed=0):
+    # The reference permutation test: shuffle the pooled rows and split them again.
+    rng = np.random.default_rng(seed)
+    pooled = np.concatenate([spend_a, spend_b])
+    observed = abs(spend_a.mean() - spend_b.mean())
+    hits = 0
+    for _ in range(permutations):
+        shuffled = rng.permutation(pooled)
+        hits += abs(shuffled[:len(spend_a)].mean() - shuffled[len(spend_a):].mean()) >= observed * (1 - 1e-9)
+    return (1 + hits) / (1 + permutations)
+
+
+def assert_close_pvalue(p, expected, permutations):
+    # Two independent Monte Carlo estimates: allow four standard errors of their difference.
+    tolerance = 4 * np.sqrt(2 * expected * (1 - expected) / permutations) + 2 / permutations
+    assert abs(p - expected) <= tolerance
+
+
+def segment_spend(df):
+    return {segment: rows["spend"].to_numpy(np.float64) for segment, rows in df.groupby("campaign_segment", observed=True)}
+
+
+def test_pvalues_do_not_depend_on_workers(campaign_df):
+    histograms = spend_histograms(campaign_df)
+    segments = sorted(histograms)
+    pairs = [(histograms[a], histograms[b]) for a, b in zip(segments, segments[1:])]
+    single = permutation_pvalues(pairs, PERMUTATIONS, workers=1)
+    parallel = permutation_pvalues(pairs, PERMUTATIONS, workers=2)
+    for got, expected in zip(parallel, single):
+        np.testing.assert_array_equal(got, expected)
+
+
+def test_exact_histograms_agree_with_row_shuffles():
+    # Few distinct values: the value-count draws are the row permutation test itself.
+    rng = np.random.default_rng(1)
+    spend_a = rng.choice([0.0, 0.0, 0.0, 20.0, 50.0, 120.0], 3_000)
+    spend_b = rng.choice([0.0, 0.0, 0.0, 20.0, 50.0, 130.0], 2_000)
+    pairs = [tuple(tuple(np.unique(spend, return_counts=True)) for spend in (spend_a, spend_b))]
+    difference, p = permutation_pvalues(pairs, PERMUTATIONS)
+    assert difference[0] == pytest.approx(spend_a.mean() - spend_b.mean())
+    assert_close_pvalue(p[0], row_shuffle_pvalue(spend_a, spend_b, PERMUTATIONS), PERMUTATIONS)
+
+
+def test_binned_sample_agrees_with_row_shuffles(campaign_df):
+    # The sample has more distinct spend values than PERMUTATION_BINS, so the pooled values are bucketed.
+    spend = segment_spend(campaign_df)
+    histograms = spend_histograms(campaign_df)
+    segments = sorted(histograms)[:2]
+    _, p = permutation_pvalues([tuple(histograms[segment] for segment in segments)], PERMUTATIONS)
+    expected = row_shuffle_pvalue(*(spend[segment] for segment in segments), PERMUTATIONS)
+    assert_close_pvalue(p[0], expected, PERMUTATIONS)
+
+
+def test_permutation_tests_replace_only_spend_rows(campaign_df):
+    cube = build_cube(campaign_df)
+    histograms = attribute_histograms(lambda by: spend_histograms(campaign_df, by), ["channel"])
+    t_tests = cube.pairwise_tests(["channel"], correction="none")
+    permuted = cube.pairwise_tests(["channel"], correction="none", spend_histograms=histograms, permutations=500)
+    other = (t_tests["metric"] != "spend").to_numpy()
+    pd.testing.assert_frame_equal(permuted[other], t_tests[other])
+    assert permuted.loc[~other, "p_value"].between(1 / 501, 1).all()
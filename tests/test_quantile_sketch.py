@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import SPEND_SKETCH, SPEND_TIERS, AggregateStore, build_cube, merge_aggregates, stream_aggregates
+from benchmarks.synthetic import synthetic_frame
+from quantile_sketch import QuantileSketch
+from tests.conftest import SAMPLE_CSV
+
+QS = [1 / 3, 2 / 3]
+
+
+@pytest.fixture(scope="module")
+def synthetic_spend():
+    return synthetic_frame(200_000)["history_spend"].to_numpy()
+
+
+def assert_edges_within_bound(values, sketch):
+    # Documented bound: within a * x of the order statistics around each qcut edge.
+    ordered = np.sort(values[~np.isnan(values)].astype(np.float64))
+    for q, got in zip(QS, sketch.quantiles(QS)):
+        rank = int(np.floor(q * (len(ordered) - 1)))
+        lower, upper = ordered[rank], ordered[min(rank + 1, len(ordered) - 1)]
+        assert lower * (1 - sketch.relative_accuracy) <= got <= upper * (1 + sketch.relative_accuracy)
+
+
+def assert_tiers_differ_only_in_edge_buckets(values, sketch):
+    edges = sketch.quantile_buckets(QS)
+    buckets = sketch.bucket(values)
+    disagreement = (pd.qcut(values, q=3, labels=False) != np.searchsorted(edges, buckets)).mean()
+    assert disagreement <= np.isin(buckets, edges).mean()
+
+
+def test_sketch_matches_qcut_on_sample(campaign_df):
+    values = campaign_df["history_spend"].to_numpy()
+    sketch = QuantileSketch(SPEND_SKETCH.relative_accuracy).update(values)
+    assert_edges_within_bound(values, sketch)
+    assert_tiers_differ_only_in_edge_buckets(values, sketch)
+
+
+def test_sketch_matches_qcut_on_synthetic(synthetic_spend):
+    sketch = QuantileSketch().update(synthetic_spend)
+    assert_edges_within_bound(synthetic_spend, sketch)
+    assert_tiers_differ_only_in_edge_buckets(synthetic_spend, sketch)
+
+
+def test_sketch_shards_merge_exactly(synthetic_spend):
+    whole = QuantileSketch().update(synthetic_spend)
+    shards = [QuantileSketch().update(part) for part in np.array_split(synthetic_spend, 7)]
+    assert shards[0].merge(*shards[1:]).counts == whole.counts
+
+
+def test_streamed_spend_profile_close_to_cube(campaign_df):
+    exact = build_cube(campaign_df).spend_profile()
+    approx = stream_aggregates(SAMPLE_CSV).spend_profile()
+    assert list(approx["spend_group"]) == list(exact["spend_group"])
+    assert set(approx["spend_group"]) == set(SPEND_TIERS)
+    assert (approx["conversion_rate"] - exact["conversion_rate"]).abs().max() < 0.01
+
+
+def test_per_segment_streams_merge_to_whole_sketch(campaign_df):
+    sketch = QuantileSketch(SPEND_SKETCH.relative_accuracy).update(campaign_df["history_spend"].to_numpy())
+    merged = merge_aggregates([
+        stream_aggregates(SAMPLE_CSV, filters={"campaign_segment": [segment]})
+        for segment in campaign_df["campaign_segment"].cat.categories
+    ])
+    assert merged.spend_sketch().counts == sketch.counts
+
+
+def test_tiers_stay_out_of_cell_keys(campaign_df):
+    aggregates = stream_aggregates(SAMPLE_CSV)
+    assert "spend_bucket" not in aggregates.keys
+    assert len(aggregates.cells) == len(build_cube(campaign_df).rollup(aggregates.keys))
+    # Segment filters keep the tier cells, attribute filters cannot.
+    assert aggregates.filter({"campaign_segment": ["No E-Mail"]}).tiers is not None
+    assert aggregates.filter({"channel": ["Web"]}).tiers is None
+
+
+def test_stored_tiers_round_trip(tmp_path):
+    store = AggregateStore(str(tmp_path))
+    aggregates = stream_aggregates(SAMPLE_CSV)
+    store.save("sample", aggregates)
+    loaded = store.load("sample")
+    assert loaded.spend_sketch().counts == aggregates.spend_sketch().counts
+    pd.testing.assert_frame_equal(loaded.spend_profile(), aggregates.spend_profile())
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import GROUP_KEYS, AggregateStore, CampaignAggregates
+from benchmarks.synthetic import synthetic_frame
+from data_loader import SEGMENT_ATTRIBUTES
+from sequential import mixture_variance, msprt_pvalues
+from significance import chi2_test
+
+LOOKS = 20
+
+
+def test_aa_false_positives_stay_below_alpha():
+    # Two identical arms checked at every look: mSPRT stays below alpha where peeking at chi-square does not.
+    rng = np.random.default_rng(0)
+    batch, rate, alpha = 500, 0.1, 0.05
+    hits = rng.binomial(batch, rate, (2, 2_000, LOOKS)).cumsum(axis=-1)
+    n = np.broadcast_to(batch * np.arange(1, LOOKS + 1), hits.shape)
+    means = hits / n
+    variances = means * (1 - means)
+    tau_sq = mixture_variance(variances[..., :1].mean(axis=0))
+    always_valid = msprt_pvalues(means[0] - means[1], (variances / n).sum(axis=0), tau_sq)
+    _, naive = chi2_test(np.moveaxis(hits, 0, -1), np.moveaxis(n, 0, -1))
+    assert (always_valid.min(axis=-1) < alpha).mean() <= alpha
+    assert (naive.min(axis=-1) < alpha).mean() > alpha
+
+
+def test_aa_campaigns_are_not_stopped():
+    # Campaign labels shuffled independently of the outcomes: no comparison should signal at any look.
+    df = synthetic_frame(200_000)
+    df["campaign_segment"] = df["campaign_segment"].sample(frac=1, random_state=0).to_numpy()
+    aggregates, state = CampaignAggregates(GROUP_KEYS), None
+    for delta in np.array_split(np.arange(len(df)), LOOKS):
+        aggregates.update(df.iloc[delta])
+        state = aggregates.sequential_tests([], state)
+    assert (state["looks"] == LOOKS).all()
+    assert (state["p_value"] > 0.05).all()
+
+
+def test_tau_is_fixed_at_the_first_look(campaign_df):
+    halves = np.array_split(np.arange(len(campaign_df)), 2)
+    first = CampaignAggregates.from_frame(campaign_df.iloc[halves[0]], GROUP_KEYS)
+    state = first.sequential_tests(SEGMENT_ATTRIBUTES)
+    both = first.merge(CampaignAggregates.from_frame(campaign_df.iloc[halves[1]], GROUP_KEYS))
+    fresh = both.sequential_tests(SEGMENT_ATTRIBUTES)
+    second = both.sequential_tests(SEGMENT_ATTRIBUTES, state)
+    usable = (state["tau_sq"] > 0).to_numpy()
+    np.testing.assert_array_equal(second["tau_sq"].to_numpy()[usable], state["tau_sq"].to_numpy()[usable])
+    assert not np.allclose(fresh["tau_sq"].to_numpy()[usable], state["tau_sq"].to_numpy()[usable])
+
+
+def test_save_carries_the_state_forward(tmp_path, campaign_df):
+    store = AggregateStore(str(tmp_path))
+    aggregates = CampaignAggregates.from_frame(campaign_df, GROUP_KEYS)
+    store.save("sample", aggregates)
+    first = store.load_sequential("sample")
+    store.save("sample", aggregates)
+    carried = store.load_sequential("sample")
+    assert (carried["looks"] == 2).all()
+    pd.testing.assert_series_equal(carried["tau_sq"], first["tau_sq"])
+    store.save("sample", aggregates, reset=True)
+    assert (store.load_sequential("sample")["looks"] == 1).all()
@@ -0,0 +1,55 @@
+import itertools
+
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency, ttest_ind
+
+from significance import chi2_test, summary_from_sums, ttest, ttest_from_sums
+
+
+def segment_pairs(df):
+    return list(itertools.combinations(df["campaign_segment"].cat.categories, 2))
+
+
+def segment_column(df, segment, column):
+    return df.loc[df["campaign_segment"] == segment, column].dropna().to_numpy(np.float64)
+
+
+@pytest.mark.parametrize("metric", ["visit", "conversion"])
+@pytest.mark.parametrize("correction", [True, False])
+def test_chi2_matches_chi2_contingency(campaign_df, metric, correction):
+    for pair in segment_pairs(campaign_df):
+        flags = [segment_column(campaign_df, segment, metric) for segment in pair]
+        hits, n = [flag.sum() for flag in flags], [len(flag) for flag in flags]
+        table = [[h, size - h] for h, size in zip(hits, n)]
+        expected_statistic, expected_p, _, _ = chi2_contingency(table, correction=correction)
+        statistic, p = chi2_test(hits, n, correction)
+        assert statistic == pytest.approx(expected_statistic, rel=1e-9)
+        assert p == pytest.approx(expected_p, rel=1e-9)
+
+
+def test_chi2_of_every_segment_at_once(campaign_df):
+    flags = [segment_column(campaign_df, segment, "conversion") for segment in campaign_df["campaign_segment"].cat.categories]
+    hits, n = [flag.sum() for flag in flags], [len(flag) for flag in flags]
+    expected_statistic, expected_p, _, _ = chi2_contingency([[h, size - h] for h, size in zip(hits, n)])
+    statistic, p = chi2_test(hits, n)
+    assert statistic == pytest.approx(expected_statistic, rel=1e-9)
+    assert p == pytest.approx(expected_p, rel=1e-9)
+
+
+@pytest.mark.parametrize("equal_var", [True, False])
+def test_ttest_matches_ttest_ind(campaign_df, equal_var):
+    for pair in segment_pairs(campaign_df):
+        a, b = (segment_column(campaign_df, segment, "spend") for segment in pair)
+        expected = ttest_ind(a, b, equal_var=equal_var)
+        from_stats = ttest(a.mean(), a.std(ddof=1), len(a), b.mean(), b.std(ddof=1), len(b), equal_var)
+        from_sums = ttest_from_sums(len(a), a.sum(), (a ** 2).sum(), len(b), b.sum(), (b ** 2).sum(), equal_var)
+        for statistic, p in (from_stats, from_sums):
+            assert statistic == pytest.approx(expected.statistic, rel=1e-6)
+            assert p == pytest.approx(expected.pvalue, rel=1e-6)
+
+
+def test_summary_from_sums(campaign_df):
+    spend = campaign_df["spend"].to_numpy(np.float64)
+    mean, std, n = summary_from_sums(len(spend), spend.sum(), (spend ** 2).sum())
+    assert (mean, std, n) == pytest.approx((spend.mean(), spend.std(ddof=1), len(spend)))